@@ -0,0 +1,145 @@
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from multiprocessing import Pool
+
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import numpy as np
+
+from sim import DIFF_PROFILES, SHOP_ITEMS, SIM_HZ, Input, PowerUp, Sim, dodge_policy, no_upgrades, upgrade_cost
+
+MAX_RUN_S = 600.0   # runs still alive after this much play are stopped and counted as survivors
+CHUNK = 25          # runs per worker task; results are streamed per chunk
+
+# a policy is make(sim, seed) -> per-tick function returning an Input
+
+def _dodge(sim, seed): return dodge_policy
+
+def _still(sim, seed): return lambda s: Input()
+
+def _random(sim, seed):
+    # hold a random direction for 0.1-0.6 s at a time
+    rng = random.Random(seed ^ 0x5EED)
+    state = [Input(), 0]
+    def policy(s):
+        if state[1] <= 0:
+            d = rng.randrange(3)
+            state[0] = Input(left=d == 1, right=d == 2); state[1] = rng.randint(6, 36)
+        state[1] -= 1
+        return state[0]
+    return policy
+
+POLICIES = {"dodge": _dodge, "still": _still, "random": _random}
+
+def parse_upgrades(spec):
+    # "none", "max" or "shield=2,magnet=3" (unlisted keys stay at 0)
+    ups = no_upgrades()
+    if spec == "none": return ups
+    if spec == "max": return {key: max_lvl for key, _, _, max_lvl, _, _ in SHOP_ITEMS}
+    for part in spec.split(","):
+        key, _, lvl = part.partition("=")
+        if key not in ups: raise argparse.ArgumentTypeError(f"unknown upgrade {key!r} (have {', '.join(ups)})")
+        ups[key] = int(lvl)
+    return ups
+
+def upgrade_label(ups):
+    return ",".join(f"{k}={v}" for k, v in ups.items() if v) or "none"
+
+def play(difficulty, policy, upgrades, seed):
+    sim = Sim(difficulty=difficulty, upgrades=upgrades)
+    sim.start(seed=seed)
+    act = POLICIES[policy](sim, seed)
+    max_ticks = int(MAX_RUN_S * SIM_HZ)
+    ticks = 0
+    while sim.state == "RUNNING" and ticks < max_ticks:
+        sim.step(act(sim)); ticks += 1
+    return {"difficulty": difficulty, "policy": policy, "upgrades": upgrade_label(upgrades), "seed": seed,
+            "time_alive": round(sim.time_alive, 4), "coins": sim.coins_collected, "ticks": ticks,
+            "died": sim.state == "GAME_OVER", "pickups": sim.pickups, "saved": sim.saved}
+
+def _run_chunk(job):
+    difficulty, policy, upgrades, seeds = job
+    return [play(difficulty, policy, upgrades, seed) for seed in seeds]
+
+def make_jobs(difficulties, policies, upgrade_sets, runs, seed0):
+    # the same seeds for every configuration, so they differ only in what is being tuned
+    seeds = list(range(seed0, seed0 + runs))
+    for d in difficulties:
+        for p in policies:
+            for ups in upgrade_sets:
+                for i in range(0, runs, CHUNK):
+                    yield d, p, ups, seeds[i:i+CHUNK]
+
+def shop_cost():
+    return sum(upgrade_cost(key, lvl) for key, _, _, max_lvl, _, _ in SHOP_ITEMS for lvl in range(max_lvl))
+
+def summarize(records):
+    # per (difficulty, policy, upgrades): survival and income distributions, power-up use per run
+    groups = {}
+    for r in records: groups.setdefault((r["difficulty"], r["policy"], r["upgrades"]), []).append(r)
+    out = []
+    for (d, p, u), rs in sorted(groups.items()):
+        t = np.array([r["time_alive"] for r in rs]); c = np.array([r["coins"] for r in rs])
+        per_run = lambda field, kind: sum(r[field].get(kind, 0) for r in rs) / len(rs)
+        minutes = t.sum() / 60.0
+        out.append({
+            "difficulty": d, "policy": p, "upgrades": u, "runs": len(rs),
+            "survival_s": {"mean": float(t.mean()), **{f"p{q}": float(np.percentile(t, q)) for q in (10, 50, 90)},
+                           "max": float(t.max())},
+            "survivors": sum(not r["died"] for r in rs),
+            "coins": {"mean": float(c.mean()), "p50": float(np.percentile(c, 50)), "p90": float(np.percentile(c, 90)),
+                      "per_min": float(c.sum() / minutes) if minutes else 0.0},
+            "pickups_per_run": {k: per_run("pickups", k) for k in PowerUp.TYPES},
+            "saved_per_run": {k: per_run("saved", k) for k in ("shield", "second")},
+            "runs_to_max_shop": shop_cost() / c.mean() if c.mean() else None,
+        })
+    return out
+
+def print_summary(rows):
+    print(f"{'difficulty':10s} {'policy':7s} {'upgrades':34s} {'runs':>5s} {'p10':>6s} {'p50':>6s} {'p90':>6s}"
+          f" {'coins':>6s} {'c/min':>6s} {'shop':>6s}  pickups/run")
+    for r in rows:
+        s = r["survival_s"]; c = r["coins"]
+        shop = f"{r['runs_to_max_shop']:.0f}" if r["runs_to_max_shop"] else "-"
+        picks = " ".join(f"{k}={v:.2f}" for k, v in r["pickups_per_run"].items())
+        print(f"{r['difficulty']:10s} {r['policy']:7s} {r['upgrades']:34s} {r['runs']:5d} {s['p10']:6.1f} {s['p50']:6.1f}"
+              f" {s['p90']:6.1f} {c['mean']:6.2f} {c['per_min']:6.2f} {shop:>6s}  {picks}")
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Run many headless BombDash games in parallel for balance tuning")
+    ap.add_argument("-n", "--runs", type=int, default=200, help="runs per configuration")
+    ap.add_argument("-d", "--difficulty", nargs="+", default=list(DIFF_PROFILES), choices=list(DIFF_PROFILES))
+    ap.add_argument("-p", "--policy", nargs="+", default=["dodge"], choices=sorted(POLICIES))
+    ap.add_argument("-u", "--upgrades", nargs="+", type=parse_upgrades, default=[no_upgrades()],
+                    help='upgrade sets: "none", "max" or e.g. "shield=2,second=1"')
+    ap.add_argument("-j", "--workers", type=int, default=os.cpu_count())
+    ap.add_argument("--seed", type=int, default=0, help="first seed")
+    ap.add_argument("-o", "--out", default="batch_runs.jsonl", help="per-run records, streamed as they finish")
+    ap.add_argument("--summary", help="also write the aggregate table as JSON")
+    args = ap.parse_args(argv)
+
+    jobs = list(make_jobs(args.difficulty, args.policy, args.upgrades, args.runs, args.seed))
+    total = sum(len(j[3]) for j in jobs)
+    records = []
+    t0 = time.perf_counter()
+    with open(args.out, "w", encoding="utf-8") as f, Pool(args.workers) as pool:
+        for chunk in pool.imap_unordered(_run_chunk, jobs):
+            for r in chunk: f.write(json.dumps(r) + "\n")
+            f.flush()
+            records.extend(chunk)
+            print(f"\r{len(records)}/{total} runs", end="", file=sys.stderr, flush=True)
+    el = time.perf_counter() - t0
+    played = sum(r["time_alive"] for r in records)
+    print(f"\r{total} runs ({played/3600:.1f} h of play) in {el:.1f}s on {args.workers} workers -> {args.out}",
+          file=sys.stderr)
+    rows = summarize(records)
+    print_summary(rows)
+    if args.summary:
+        with open(args.summary, "w", encoding="utf-8") as f: json.dump(rows, f, indent=2)
+
+if __name__ == "__main__":
+    main()
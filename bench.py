@@ -0,0 +1,241 @@
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import numpy as np
+import pygame
+
+import bomb
+from sim import BOMB_SIZE, SIM_DT
+
+PHASES = ("update", "draw", "present")
+WARMUP_FRAMES = 30
+FRAME_S = 1.0 / bomb.FPS            # frames are timed as on a 60 Hz display...
+STEPS = round(FRAME_S / SIM_DT)     # ...so each runs this many sim steps, as main() does
+ABS_FLOOR_MS = 0.05   # differences below this are noise, never a regression
+
+SCENARIOS = {}
+
+def scenario(name):
+    def register(fn):
+        SCENARIOS[name] = fn
+        return fn
+    return register
+
+def _keep_alive(game):
+    # hits consume the second chance instead of ending the run, so the load never stops
+    game.player.second_chance_available = True
+
+def _fill_bombs(game, n, rnd, spread):
+    h = game.size[1]
+    while game.bombs.n < n:
+        game.bombs.spawn(rnd.randint(0, game.size[0] - BOMB_SIZE), game.bomb_speed)
+        if spread: game.bombs.y[game.bombs.n-1] = rnd.randint(-BOMB_SIZE, h - 1)
+
+def _fill_coins(game, n, rnd, spread):
+    h = game.size[1]
+    while game.coins.n < n:
+        game.coins.spawn(rnd.randint(20, game.size[0] - 20))
+        if spread: game.coins.y[game.coins.n-1] = rnd.uniform(-18, h - 1)
+
+# each scenario prepares the game and returns (frame, entities): frame() runs one frame's
+# phases through the timer, entities() reports how many things that frame moved or drew
+
+def _running(game, before_frame, entities):
+    def frame(t):
+        before_frame()
+        with t("update"):
+            for _ in range(STEPS):
+                _keep_alive(game); game.update(SIM_DT)
+            game.animate(FRAME_S)
+        with t("draw"): game.draw()
+        with t("present"): bomb.renderer.present()
+    return frame, entities
+
+@scenario("bombs500")
+def _bombs500(game, rnd):
+    game.start(); game.clear_timers()
+    _fill_bombs(game, 500, rnd, spread=True)
+    def before():
+        _keep_alive(game); _fill_bombs(game, 500, rnd, spread=False)
+    return _running(game, before, lambda: game.bombs.n)
+
+@scenario("particles20k")
+def _particles20k(game, rnd):
+    game.start(); game.clear_timers()
+    game.particles = bomb.ParticleSystem(cap=20000)
+    w, h = game.size
+    def before():
+        _keep_alive(game)
+        missing = game.particles.cap - len(game.particles)
+        for _ in range(20):
+            game.pop_particles(rnd.randint(0, w), rnd.randint(h//4, h), count=missing // 20 + 1, color=bomb.PURPLE)
+    return _running(game, before, lambda: len(game.particles))
+
+@scenario("magnet300")
+def _magnet300(game, rnd):
+    game.start(); game.clear_timers()
+    _fill_coins(game, 300, rnd, spread=True)
+    def before():
+        _keep_alive(game); game.player.magnet_time_left = 60.0
+        _fill_coins(game, 300, rnd, spread=False)
+    return _running(game, before, lambda: game.coins.n)
+
+@scenario("late_game")
+def _late_game(game, rnd):
+    # ordinary spawning with the difficulty already bumped 8 times
+    game.start()
+    for _ in range(8): game.bump_difficulty()
+    return _running(game, lambda: _keep_alive(game),
+                    lambda: game.bombs.n + game.coins.n + len(game.powerups) + len(game.particles))
+
+def _static(draw):
+    def frame(t):
+        with t("draw"): draw()
+        with t("present"): bomb.renderer.present()
+    return frame, lambda: 0
+
+@scenario("menu_idle")
+def _menu_idle(game, rnd):
+    game.reset_full()
+    return _static(lambda: bomb.draw_menu(game, *bomb.screen.get_size()))
+
+@scenario("menu_redraw")
+def _menu_redraw(game, rnd):
+    # what a menu frame costs when it does have to be redrawn (hover change, new screen)
+    game.reset_full()
+    def draw():
+        bomb.renderer.invalidate(); bomb.draw_menu(game, *bomb.screen.get_size())
+    return _static(draw)
+
+@scenario("shop_idle")
+def _shop_idle(game, rnd):
+    game.reset_full()
+    return _static(lambda: bomb.draw_shop(*bomb.screen.get_size()))
+
+@scenario("settings_idle")
+def _settings_idle(game, rnd):
+    game.reset_full()
+    return _static(lambda: bomb.draw_settings(*bomb.screen.get_size()))
+
+class PhaseTimer:
+    # samples go into preallocated arrays so timing itself allocates nothing per frame
+    def __init__(self, frames):
+        self.frames = frames
+        self.samples = {}
+        self.name = None
+        self.i = 0
+
+    def __call__(self, name):
+        self.name = name
+        return self
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+
+    def __exit__(self, *exc):
+        a = self.samples.get(self.name)
+        if a is None: a = self.samples[self.name] = np.zeros(self.frames)
+        a[self.i] += (time.perf_counter() - self.t0) * 1000.0
+
+def _stats(ms):
+    a = np.asarray(ms)
+    return {"mean": float(a.mean()), "p50": float(np.percentile(a, 50)),
+            "p95": float(np.percentile(a, 95)), "p99": float(np.percentile(a, 99)), "max": float(a.max())}
+
+def run_scenario(name, frames, seed=0):
+    game = bomb.Game()
+    game.particles.clear()
+    bomb.renderer.invalidate()
+    frame, entities = SCENARIOS[name](game, random.Random(seed))
+    if game.state == "RUNNING": bomb.gc_control.hold()   # as main() does during a run
+    warm = PhaseTimer(1)
+    for _ in range(WARMUP_FRAMES): frame(warm)
+    t = PhaseTimer(frames)
+    moved = 0
+    collections = sum(g["collections"] for g in gc.get_stats())
+    blocks = sys.getallocatedblocks()
+    for t.i in range(frames):
+        frame(t)
+        moved += entities()
+    blocks = sys.getallocatedblocks() - blocks
+    collections = sum(g["collections"] for g in gc.get_stats()) - collections
+    bomb.gc_control.release()
+    busy_s = sum(v.sum() for v in t.samples.values()) / 1000.0
+    phases = {p: _stats(t.samples[p]) for p in PHASES if p in t.samples}
+    total = np.sum([t.samples[p] for p in phases], axis=0)
+    return {"frames": frames, "phases": phases, "frame": _stats(total),
+            "entities_per_frame": moved / frames, "entities_per_s": moved / busy_s if busy_s else 0.0,
+            "alloc_blocks_per_frame": blocks / frames, "gc_collections": collections}
+
+def compare(results, baseline, tolerance):
+    # a phase regresses when its p50 grows by more than `tolerance` (and by more than the noise floor)
+    bad = []
+    for name, res in results["scenarios"].items():
+        base = baseline.get("scenarios", {}).get(name)
+        if not base: continue
+        for phase, st in dict(res["phases"], frame=res["frame"]).items():
+            old = base["frame"] if phase == "frame" else base["phases"].get(phase)
+            if not old: continue
+            was, now = old["p50"], st["p50"]
+            flag = now > was * (1 + tolerance) and now - was > ABS_FLOOR_MS
+            print(f"  {name:14s} {phase:8s} p50 {was:8.3f} -> {now:8.3f} ms {'REGRESSION' if flag else ''}")
+            if flag: bad.append((name, phase))
+    return bad
+
+def _isolate():
+    # never touch the player's save, replay or settings: start from defaults in a temp dir
+    tmp = Path(tempfile.mkdtemp(prefix="bombdash-bench-"))
+    bomb.SAVE_FILE = bomb.saver.path = tmp / "save.json"
+    bomb.REPLAY_FILE = tmp / "last_run.bdr"
+    bomb.RUNS_DIR = tmp / "runs"
+    bomb.bootstrap()
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="BombDash stress benchmarks (dummy SDL video driver)")
+    ap.add_argument("-s", "--scenario", action="append", choices=sorted(SCENARIOS),
+                    help="run only these scenarios (repeatable); default: all")
+    ap.add_argument("-n", "--frames", type=int, default=300)
+    ap.add_argument("-o", "--out", help="write JSON results here")
+    ap.add_argument("-b", "--baseline", help="compare against a previous JSON result")
+    ap.add_argument("--tolerance", type=float, default=0.25, help="allowed p50 slowdown (fraction)")
+    ap.add_argument("--dirty", action="store_true", help="present through dirty rects")
+    ap.add_argument("--scale", type=int, default=100, choices=bomb.RENDER_SCALES, help="render scale in %%")
+    args = ap.parse_args(argv)
+
+    _isolate()
+    bomb.save.dirty_rects = args.dirty
+    bomb.save.render_scale = args.scale
+    results = {"meta": {"python": platform.python_version(), "pygame": pygame.version.ver,
+                        "numpy": np.__version__, "platform": platform.platform(),
+                        "video_driver": os.environ.get("SDL_VIDEODRIVER"), "frames": args.frames,
+                        "dirty_rects": args.dirty, "render_scale": args.scale, "time": time.strftime("%Y-%m-%dT%H:%M:%S")},
+               "scenarios": {}}
+    for name in args.scenario or SCENARIOS:
+        res = results["scenarios"][name] = run_scenario(name, args.frames)
+        cols = "  ".join(f"{p} {s['p50']:.3f}/{s['p95']:.3f}/{s['p99']:.3f}" for p, s in res["phases"].items())
+        print(f"{name:14s} frame p50 {res['frame']['p50']:.3f} ms  [{cols}]  "
+              f"{res['entities_per_frame']:.0f} ent/frame  {res['entities_per_s']:.0f} ent/s  "
+              f"{res['alloc_blocks_per_frame']:+.1f} blk/frame  {res['gc_collections']} gc")
+    if args.out:
+        Path(args.out).write_text(json.dumps(results, indent=2))
+    if args.baseline:
+        print(f"vs {args.baseline}:")
+        bad = compare(results, json.loads(Path(args.baseline).read_text()), args.tolerance)
+        if bad:
+            print(f"{len(bad)} regression(s)")
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
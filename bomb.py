@@ -1,13 +1,22 @@
 import pygame
-import random
+import numpy as np
+import gc
+import os
 import sys
 import json
+import queue
+import threading
+import time
+import zlib
+from collections import OrderedDict
 from pathlib import Path
 from dataclasses import dataclass, asdict
 
-pygame.init()
-BASE_WIDTH, BASE_HEIGHT = 540, 720
-FPS = 60
+from ledger import RunLedger, run_record
+from sim import BASE_WIDTH, BASE_HEIGHT, SIM_DT, BOMB_SIZE, COIN_R, PLAYER_SIZE, SHOP_ITEMS, upgrade_cost, INPUTS, PowerUp, Sim
+
+FPS = 60             # frame cap when none is set, and whenever vsync is unavailable
+MAX_FRAME_S = 0.25
 
 BG_TOP    = (235, 240, 255)
 BG_BOTTOM = (250, 250, 250)
@@ -29,6 +38,11 @@ ORANGE= (255, 140, 0)
 PURPLE= (145, 70, 255)
 
 SAVE_FILE = Path("save.json")
+REPLAY_FILE = Path("last_run.bdr")
+RUNS_DIR = Path("runs")   # the run ledger, see ledger.py
+RENDER_SCALES = (100, 75, 50)
+FRAME_CAPS = (60, 120, 144, 0)   # render rate limits in Hz; 0 paces frames by vsync instead
+VSYNC_MAX_HZ = 240   # clock ceiling under vsync, for drivers that take vsync=1 but don't pace flip()
 
 @dataclass
 class SaveData:
@@ -38,6 +52,9 @@ class SaveData:
     fullscreen: bool = False
     coins_total: int = 0
     upgrades: dict = None        
+    dirty_rects: bool = False
+    render_scale: int = 100      # % of the window the game world is drawn at, see RENDER_SCALES
+    frame_cap: int = 60          # Hz, see FRAME_CAPS; independent of the simulation rate
 
 def load_save():
     if SAVE_FILE.exists():
@@ -50,56 +67,339 @@ def load_save():
                 difficulty=str(raw.get("difficulty", "Normal")),
                 fullscreen=bool(raw.get("fullscreen", False)),
                 coins_total=int(raw.get("coins_total", 0)),
-                upgrades=upg
+                upgrades=upg,
+                dirty_rects=bool(raw.get("dirty_rects", False)),
+                render_scale=raw.get("render_scale") if raw.get("render_scale") in RENDER_SCALES else 100,
+                frame_cap=raw.get("frame_cap") if raw.get("frame_cap") in FRAME_CAPS else 60
             )
         except Exception:
             pass
     return SaveData(upgrades={"shield":0,"magnet":0,"drops":0,"second":0})
 
+SAVE_DEBOUNCE_S = 0.75
+
+class SaveWriter:
+    # coalesces save requests and writes the latest snapshot from a daemon thread once
+    # nothing has changed for `debounce` seconds; the file is replaced atomically
+    def __init__(self, path=SAVE_FILE, debounce=SAVE_DEBOUNCE_S):
+        self.path = Path(path)
+        self.debounce = debounce
+        self.cond = threading.Condition()
+        self.io = threading.Lock()
+        self.pending = None          # (seq, snapshot)
+        self.due = 0.0
+        self.seq = self.written = 0
+        self.writes = 0
+        self.thread = None           # started by the first mark()
+
+    def mark(self, s, due=None):
+        snap = asdict(s)   # deep copy, so later edits on the main thread can't race the writer
+        with self.cond:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name="save-writer", daemon=True)
+                self.thread.start()
+            self.seq += 1
+            self.pending = (self.seq, snap)
+            self.due = time.monotonic() + self.debounce if due is None else due
+            self.cond.notify()
+
+    def flush(self, s):
+        # write as soon as possible, without waiting for it (game over)
+        self.mark(s, due=0.0)
+
+    def close(self):
+        # synchronous final write (quit); also waits for a write already in flight
+        with self.cond:
+            job, self.pending = self.pending, None
+        with self.io:
+            if job is not None: self._write(*job)
+
+    def _run(self):
+        while True:
+            with self.cond:
+                while self.pending is None: self.cond.wait()
+                delay = self.due - time.monotonic()
+                if delay > 0:
+                    self.cond.wait(delay)
+                    continue
+                job, self.pending = self.pending, None
+                # io is taken before cond is let go: a close() in between must wait for this write
+                self.io.acquire()
+            try:
+                self._write(*job)
+            finally:
+                self.io.release()
+
+    def _write(self, seq, snap):
+        if seq <= self.written: return   # a newer snapshot already landed
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(snap, f, ensure_ascii=False, indent=2)
+                f.flush(); os.fsync(f.fileno())
+            os.replace(tmp, self.path)
+            self.written = seq; self.writes += 1
+        except Exception:
+            pass
+
+saver = SaveWriter()
+
 def save_save(s: SaveData):
+    saver.mark(s)
+
+def quit_game():
+    saver.close()
+    ledger.close()
+    if profiler.log is not None: print(latency.report(), file=sys.stderr)
+    profiler.close()
+    capture.close()
+    pygame.quit(); sys.exit()
+
+# set by bootstrap(); importing this module opens no window and touches no files
+save = None
+screen = None
+clock = None
+ledger = None
+vsync = False   # whether the window got vsync; not every driver offers it
+
+def open_window():
+    # (re)creates the display surface for the fullscreen and frame cap settings
+    global vsync
+    flags = pygame.FULLSCREEN if save.fullscreen else 0
+    if save.frame_cap == 0:
+        try:
+            vsync = True
+            return pygame.display.set_mode((BASE_WIDTH, BASE_HEIGHT), flags | pygame.SCALED, vsync=1)
+        except pygame.error:
+            pass   # fall back to the FPS cap
+    vsync = False
+    return pygame.display.set_mode((BASE_WIDTH, BASE_HEIGHT), flags)
+
+def frame_cap():
+    # the frame rate limit; 0 leaves the pacing to vsync in flip(), with only VSYNC_MAX_HZ
+    # as a ceiling on the clock
+    return save.frame_cap or (0 if vsync else FPS)
+
+def set_music_volume(volume):
+    if pygame.mixer.get_init(): pygame.mixer.music.set_volume(volume/100.0)
+
+def bootstrap():
+    # only the subsystems the game uses: video (+ its event queue) and the mixer for music;
+    # fonts are opened on first use by get_font()
+    global save, screen, clock, ledger
+    if screen is not None: return screen   # already up (tools may bootstrap before main())
+    save = load_save()
+    ledger = RunLedger(RUNS_DIR)
+    pygame.display.init()
     try:
-        SAVE_FILE.write_text(json.dumps(asdict(s), ensure_ascii=False, indent=2))
-    except Exception:
-        pass
+        pygame.mixer.init()
+    except pygame.error:
+        pass   # no audio device: play silently
+    set_music_volume(save.volume)
+    screen = open_window()
+    pygame.display.set_caption("DODGE! — Shop & UI Edition")
+    clock = pygame.time.Clock()
+    path = os.environ.get(PROFILE_ENV)
+    if path: profiler.open_log(path)
+    path = os.environ.get(CAPTURE_ENV)
+    if path: capture.start(path, int(os.environ.get(CAPTURE_EVERY_ENV, "1")))
+    return screen
+
+FONT_SMALL, FONT_MID, FONT_BIG = 26, 32, 48
+
+_fonts = {}
+
+def get_font(size):
+    f = _fonts.get(size)
+    if f is None:
+        if not pygame.font.get_init(): pygame.font.init()
+        f = _fonts[size] = pygame.font.Font(None, size)   # pygame's bundled font: no system font scan
+    return f
+
+DIRTY_MAX_FRACTION = 0.4
+
+class DirtyRects:
+    # optional partial presentation (save.dirty_rects): only the regions drawn last frame and
+    # this frame are pushed, with a full flip when they cover too much of the screen
+    def __init__(self):
+        self.prev = []; self.cur = []
+        self.full = True
+
+    @property
+    def partial(self): return save.dirty_rects and not self.full
+
+    def invalidate(self): self.full = True
+
+    def mark(self, rects): self.cur.extend(rects)
 
-save = load_save()
+    def present(self):
+        if self.partial:
+            rects = self.prev + self.cur
+            w, h = screen.get_size()
+            if sum(r.w * r.h for r in rects) <= DIRTY_MAX_FRACTION * w * h: pygame.display.update(rects)
+            else: pygame.display.flip()
+        else:
+            pygame.display.flip()
+        self.prev, self.cur = self.cur, []
+        self.full = False
 
-flags = pygame.FULLSCREEN if save.fullscreen else 0
-screen = pygame.display.set_mode((BASE_WIDTH, BASE_HEIGHT), flags)
-pygame.display.set_caption("DODGE! — Shop & UI Edition")
-clock = pygame.time.Clock()
-font  = pygame.font.SysFont(None, 26)
-font_mid = pygame.font.SysFont(None, 32)
-font_big = pygame.font.SysFont(None, 48)
+renderer = DirtyRects()
 
-pygame.mixer.music.set_volume(save.volume/100.0)
+class GCControl:
+    # no cyclic collections while a run is live: what exists when it starts is frozen out of
+    # the collector, and the deferred work is done at the next safe point (pause, game over,
+    # menus). Entity storage is pooled or array-backed, so a run creates little garbage
+    def __init__(self):
+        self.held = False
+
+    def hold(self):
+        if self.held: return
+        gc.collect(); gc.freeze(); gc.disable()
+        self.held = True
+
+    def release(self):
+        if not self.held: return
+        gc.unfreeze(); gc.enable(); gc.collect()
+        self.held = False
+
+gc_control = GCControl()
+
+# best first. burst: share of each pop_particles burst emitted; particles: live particle
+# limit (None = the system's cap). Particles are what frame time scales with; sprites,
+# the background and panel shadows are prebaked blits whose cost doesn't depend on their
+# detail (and a run draws no panel until it pauses or ends), so they have no tier
+QUALITY_TIERS = (
+    dict(name="high",   burst=1.0,  particles=None),
+    dict(name="medium", burst=0.5,  particles=2000),
+    dict(name="low",    burst=0.25, particles=600),
+)
+GOVERNOR_WINDOW = 30   # frames per decision
+GOVERNOR_DOWN = 0.85   # drop a tier when a window's p90 update+draw time is over this share of the budget
+GOVERNOR_UP = 0.5      # climb back one when it is under this share...
+GOVERNOR_HOLD = 4      # ...for this many windows in a row
+
+class QualityGovernor:
+    # moves between QUALITY_TIERS to keep RUNNING frames inside the frame budget. Dropping
+    # takes one bad window, climbing back needs GOVERNOR_HOLD good ones, so it doesn't flap
+    def __init__(self):
+        self.ms = np.zeros(GOVERNOR_WINDOW); self.i = 0
+        self.level = 0; self.tier = QUALITY_TIERS[0]
+        self.calm = 0
+        self.changes = 0
+
+    def frame(self, ms, budget_ms):
+        # True when the tier changed: the caller redraws everything
+        self.ms[self.i] = ms; self.i += 1
+        if self.i < GOVERNOR_WINDOW: return False
+        self.i = 0
+        load = np.percentile(self.ms, 90) / budget_ms
+        level = self.level
+        if load > GOVERNOR_DOWN:
+            level += 1; self.calm = 0
+        elif load < GOVERNOR_UP:
+            self.calm += 1
+            if self.calm >= GOVERNOR_HOLD: level -= 1; self.calm = 0
+        else:
+            self.calm = 0
+        return self.set(level)
+
+    def set(self, level):
+        level = max(0, min(level, len(QUALITY_TIERS) - 1))
+        if level == self.level: return False
+        self.level = level; self.tier = QUALITY_TIERS[level]; self.changes += 1
+        return True
+
+governor = QualityGovernor()
+
+_canvas_cache = {}
+
+def world_canvas(scale):
+    # offscreen surface the game world is drawn into below 100% render scale
+    w, h = screen.get_size()
+    size = (max(1, w * scale // 100), max(1, h * scale // 100))
+    c = _canvas_cache.get(size)
+    if c is None: c = _canvas_cache[size] = pygame.Surface(size).convert()
+    return c
+
+_bg_cache = {}
+
+def gradient_bg(size, top=BG_TOP, bottom=BG_BOTTOM):
+    # built once per (size, colours); cleared whenever the display mode changes
+    key = (tuple(size), top, bottom)
+    bg = _bg_cache.get(key)
+    if bg is None:
+        w, h = key[0]
+        t = np.linspace(0.0, 1.0, h)[:, None]
+        rows = (np.array(top)*(1-t) + np.array(bottom)*t).astype(np.uint8)
+        bg = pygame.Surface((w, h))
+        pygame.surfarray.blit_array(bg, np.ascontiguousarray(np.broadcast_to(rows, (w, h, 3))))
+        if pygame.display.get_surface(): bg = bg.convert()
+        _bg_cache[key] = bg
+    return bg
 
 def draw_gradient_bg(surf):
-    w, h = surf.get_size()
-    for y in range(h):
-        t = y / max(1, h-1)
-        r = int(BG_TOP[0]*(1-t) + BG_BOTTOM[0]*t)
-        g = int(BG_TOP[1]*(1-t) + BG_BOTTOM[1]*t)
-        b = int(BG_TOP[2]*(1-t) + BG_BOTTOM[2]*t)
-        pygame.draw.line(surf, (r,g,b), (0,y), (w,y))
-
-def text(s, x, y, c=TEXT, center=False, big=False, mid=False):
-    f = font_big if big else font_mid if mid else font
-    img = f.render(s, True, c)
+    surf.blit(gradient_bg(surf.get_size()), (0, 0))
+
+TEXT_CACHE_SIZE = 512
+
+class TextCache:
+    # bounded LRU of rendered strings keyed by (string, font, colour)
+    def __init__(self, maxsize=TEXT_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.hits = self.misses = 0
+        self.items = OrderedDict()
+
+    def render(self, s, f, c):
+        key = (s, f, tuple(c))
+        img = self.items.get(key)
+        if img is not None:
+            self.hits += 1; self.items.move_to_end(key)
+            return img
+        self.misses += 1
+        img = self.items[key] = f.render(s, True, c)
+        if len(self.items) > self.maxsize: self.items.popitem(last=False)
+        return img
+
+    def clear(self):
+        self.items.clear(); self.hits = self.misses = 0
+
+text_cache = TextCache()
+
+def pick_font(big=False, mid=False):
+    return get_font(FONT_BIG if big else FONT_MID if mid else FONT_SMALL)
+
+def text(s, x, y, c=TEXT, center=False, big=False, mid=False, surf=None):
+    img = text_cache.render(s, pick_font(big, mid), c)
     r = img.get_rect()
     if center:
         r.center = (x, y)
     else:
         r.topleft = (x, y)
-    screen.blit(img, r)
-
-def rounded_panel(rect, fill=PANEL, border=OUTLINE, radius=18, shadow=True):
+    (screen if surf is None else surf).blit(img, r)
+
+def text_num(label, value, x, y, c=TEXT, big=False, mid=False):
+    # label is cached whole; the changing value is laid out from per-character glyphs
+    f = pick_font(big, mid)
+    img = text_cache.render(label, f, c)
+    screen.blit(img, (x, y))
+    x += img.get_width()
+    for ch in value:
+        g = text_cache.render(ch, f, c)
+        screen.blit(g, (x, y)); x += g.get_width()
+
+_shadow_cache = {}
+
+def rounded_panel(rect, fill=PANEL, border=OUTLINE, radius=18, shadow=True, surf=None):
+    surf = screen if surf is None else surf
     if shadow:
-        sh = pygame.Surface((rect.w+12, rect.h+12), pygame.SRCALPHA)
-        pygame.draw.rect(sh, (0,0,0,40), sh.get_rect(), border_radius=radius+6)
-        screen.blit(sh, (rect.x-6, rect.y+6))
-    pygame.draw.rect(screen, fill, rect, border_radius=radius)
-    pygame.draw.rect(screen, border, rect, width=1, border_radius=radius)
+        key = (rect.w, rect.h, radius)
+        sh = _shadow_cache.get(key)
+        if sh is None:
+            sh = _shadow_cache[key] = pygame.Surface((rect.w+12, rect.h+12), pygame.SRCALPHA)
+            pygame.draw.rect(sh, (0,0,0,40), sh.get_rect(), border_radius=radius+6)
+        surf.blit(sh, (rect.x-6, rect.y+6))
+    pygame.draw.rect(surf, fill, rect, border_radius=radius)
+    pygame.draw.rect(surf, border, rect, width=1, border_radius=radius)
 
 class Button:
     def __init__(self, rect, label, kind="primary"):
@@ -121,6 +421,8 @@ class Button:
             pygame.draw.rect(screen, color, self.rect, border_radius=12)
             text(self.label, self.rect.centerx, self.rect.centery, (255,255,255), center=True)
 
+    def look(self, mouse): return self.label, self.rect.collidepoint(mouse)
+
     def clicked(self, event):
         return event.type == pygame.MOUSEBUTTONDOWN and event.button == 1 and self.rect.collidepoint(event.pos)
 
@@ -138,6 +440,8 @@ class Slider:
         pygame.draw.circle(screen, PRIMARY, (knob_x, y+h//2), 10)
         pygame.draw.circle(screen, (255,255,255), (knob_x, y+h//2), 8)
 
+    def look(self, mouse): return int(self.rect.w * self.value)
+
     def handle(self, event):
         x,y,w,h = self.rect
         if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
@@ -160,478 +464,947 @@ class Select:
         s = self.options[self.selected]
         text(s, self.rect.centerx, self.rect.centery, PRIMARY, center=True)
 
+    def look(self, mouse): return self.selected
+
     def handle(self, event):
         if event.type == pygame.MOUSEBUTTONDOWN and self.rect.collidepoint(event.pos):
             self.selected = (self.selected + 1) % len(self.options)
 
+def reopen_window():
+    # a new display surface: everything cached against the old one is rebuilt
+    _bg_cache.clear(); atlas.clear(); _canvas_cache.clear()
+    for view in (menu_ui, settings_ui, shop_ui): view.reset()
+    renderer.invalidate()
+    return open_window()
+
 def toggle_fullscreen():
     save.fullscreen = not save.fullscreen
     save_save(save)
-    flags = pygame.FULLSCREEN if save.fullscreen else 0
-    return pygame.display.set_mode((BASE_WIDTH, BASE_HEIGHT), flags)
-
-DIFF_PROFILES = {
-    "Easy":   dict(BOMB_SPEED0=160.0, SPAWN_MS0=900, SPAWN_MIN_MS=320, STEP_V=24.0, STEP_SPAWN=60),
-    "Normal": dict(BOMB_SPEED0=185.0, SPAWN_MS0=780, SPAWN_MIN_MS=260, STEP_V=28.0, STEP_SPAWN=70),
-    "Hard":   dict(BOMB_SPEED0=210.0, SPAWN_MS0=700, SPAWN_MIN_MS=220, STEP_V=34.0, STEP_SPAWN=80),
-}
-
-PLAYER_SIZE   = 52
-PLAYER_SPEED  = 340.0
-BOMB_SIZE     = 30
-DIFF_EVERY_S  = 10
-
-POWERUP_MS    = (5600, 8200)   
-SLOW_FACTOR   = 0.5
-SLOW_TIME     = 5.0
-SHIELD_TIME   = 8.0           
-MAGNET_TIME   = 7.0           
-BOMB_CLEAN_LABEL = "Ω"
-
-COIN_MS       = 900
-COIN_VY       = 150.0
-COIN_MAGNET_ACCEL = 520.0
-COIN_MAX_SPEED    = 440.0
-
-NEW_BOMB  = pygame.USEREVENT + 1
-NEW_PWR   = pygame.USEREVENT + 2
-NEW_COIN  = pygame.USEREVENT + 3
-
-class Particle:
-    __slots__ = ("x","y","vx","vy","life","color","size")
-    def __init__(self, x, y, color):
-        self.x, self.y = x, y
-        self.vx = random.uniform(-120, 120)
-        self.vy = random.uniform(-60, -220)
-        self.life = random.uniform(0.5, 0.9)
-        self.color = color
-        self.size = random.randint(2,4)
-
-    def update(self, dt):
-        self.life -= dt
-        self.vy += 380 * dt
-        self.x += self.vx * dt
-        self.y += self.vy * dt
-
-    def draw(self, surf):
-        if self.life > 0:
-            alpha = max(0, min(255, int(255 * (self.life / 0.9))))
-            s = pygame.Surface((self.size, self.size), pygame.SRCALPHA)
-            s.fill((*self.color, alpha))
-            surf.blit(s, (int(self.x), int(self.y)))
-
-class Player:
+    return reopen_window()
+
+PROFILE_ENV = "BOMBDASH_PROFILE"   # path to a .csv or .jsonl per-frame log; setting it starts the profiler
+PROFILE_FRAMES = 600               # rolling window for the percentiles
+PROFILE_GRAPH = 120                # frames shown in the overlay graph
+DROP_FACTOR = 1.5                  # a frame taking this many FPS budgets missed at least one
+PROFILE_PHASES = ("wait", "events",
+                  "update.spawn", "update.player", "update.bombs", "update.powerups", "update.coins",
+                  "update.cull", "update.collide", "update.particles",
+                  "draw.bg", "draw.bombs", "draw.powerups", "draw.coins", "draw.player", "draw.particles",
+                  "draw.upscale", "draw.hud", "draw.ui", "overlay", "present")
+PROFILE_GROUPS = ("events", "update", "draw", "overlay", "present")
+GROUP_COLORS = {"events": MUTED, "update": PRIMARY, "draw": ORANGE, "overlay": PURPLE, "present": GREEN}
+
+class FrameProfiler:
+    # F3 overlay: lap(name) charges the time since the previous lap to that phase and
+    # end_frame() closes the row; while off, lap() is a single attribute check
     def __init__(self):
-        w, h = screen.get_size()
-        self.rect = pygame.Rect(w//2 - PLAYER_SIZE//2, h-PLAYER_SIZE-16, PLAYER_SIZE, PLAYER_SIZE)
-        self.speed = PLAYER_SPEED
-        self.has_shield = False
-        self.shield_time_left = 0.0
-        self.magnet_time_left = 0.0
-        self.second_chance_available = bool(save.upgrades.get("second",0))
+        self.col = {p: i for i, p in enumerate(PROFILE_PHASES)}
+        self.groups = {g: [i for i, p in enumerate(PROFILE_PHASES) if p.split(".")[0] == g] for g in PROFILE_GROUPS}
+        self.hist = np.zeros((PROFILE_FRAMES, len(PROFILE_PHASES)))
+        self.wall = np.zeros(PROFILE_FRAMES)
+        self.gc_ms = np.zeros(PROFILE_FRAMES)     # time inside cyclic GC collections
+        self.blocks = np.zeros(PROFILE_FRAMES)    # net pymalloc blocks allocated; 0 in steady state
+        self.gc_t = self.gc_acc = 0.0
+        self.last_blocks = sys.getallocatedblocks()
+        gc.callbacks.append(self._gc_event)
+        self.row = [0.0] * len(PROFILE_PHASES)
+        self.frames = 0; self.dropped = 0
+        self.overlay = self.on = False
+        self.log = None; self.log_path = None
+        self.summary = None; self.panel = None
+        self.t = self.t_frame = time.perf_counter()
+
+    def open_log(self, path):
+        self.log_path = Path(path)
+        self.log = self.log_path.open("w", encoding="utf-8")
+        if self.log_path.suffix != ".jsonl":
+            head = ("frame", "wall_ms", "dropped", "gc_ms", "alloc_blocks", "quality", "input_lo_ms", "input_hi_ms")
+            self.log.write(",".join(head + PROFILE_PHASES) + "\n")
+        self.on = True
+
+    def toggle(self):
+        self.overlay = not self.overlay
+        self.on = self.overlay or self.log is not None
+        self.t = self.t_frame = time.perf_counter()
+        self.last_blocks = sys.getallocatedblocks()
+
+    def _gc_event(self, phase, info):
+        if not self.on: return
+        if phase == "start": self.gc_t = time.perf_counter()
+        else: self.gc_acc += time.perf_counter() - self.gc_t
+
+    def lap(self, name):
+        if not self.on: return
+        now = time.perf_counter()
+        self.row[self.col[name]] += now - self.t
+        self.t = now
+
+    def end_frame(self):
+        if not self.on: return
+        now = time.perf_counter()
+        wall = (now - self.t_frame) * 1000.0
+        dropped = wall > DROP_FACTOR * 1000.0 / (frame_cap() or FPS)
+        i = self.frames % PROFILE_FRAMES
+        self.hist[i] = self.row; self.hist[i] *= 1000.0
+        self.wall[i] = wall
+        blocks = sys.getallocatedblocks()
+        self.blocks[i] = blocks - self.last_blocks; self.last_blocks = blocks
+        self.gc_ms[i] = self.gc_acc * 1000.0; self.gc_acc = 0.0
+        self.frames += 1; self.dropped += dropped
+        if self.log is not None: self.write_row(wall, dropped, self.gc_ms[i], int(self.blocks[i]), self.hist[i].tolist())
+        if self.overlay and (self.summary is None or self.frames % 30 == 0): self.summary = self.stats()
+        self.row = [0.0] * len(PROFILE_PHASES)
+        self.t = self.t_frame = time.perf_counter()
+
+    def write_row(self, wall, dropped, gc_ms, blocks, ms):
+        # input_*: the latency range of an input this frame's flip completed; empty/null otherwise
+        lat = latency.sample
+        if self.log_path.suffix == ".jsonl":
+            rec = {"frame": self.frames, "wall_ms": round(wall, 3), "dropped": dropped,
+                   "gc_ms": round(gc_ms, 4), "alloc_blocks": blocks, "quality": governor.tier["name"],
+                   "input_lo_ms": lat and round(lat[0], 3), "input_hi_ms": lat and round(lat[1], 3)}
+            rec.update((p, round(v, 4)) for p, v in zip(PROFILE_PHASES, ms))
+            self.log.write(json.dumps(rec) + "\n")
+        else:
+            lat = f"{lat[0]:.3f},{lat[1]:.3f}" if lat else ","
+            self.log.write(f"{self.frames},{wall:.3f},{int(dropped)},{gc_ms:.4f},{blocks},{governor.tier['name']},{lat},"
+                           + ",".join(f"{v:.4f}" for v in ms) + "\n")
+
+    def window(self):
+        n = min(self.frames, PROFILE_FRAMES)
+        return self.hist[:n], self.wall[:n]
+
+    def stats(self):
+        # p50/p95/p99 in ms for the whole frame (minus the tick wait), each group and each phase
+        hist, _ = self.window()
+        if not len(hist): return {}
+        cols = {"frame": hist[:, 1:].sum(axis=1)}
+        cols.update((g, hist[:, idx].sum(axis=1)) for g, idx in self.groups.items())
+        cols.update((p, hist[:, i]) for p, i in self.col.items())
+        n = len(hist)
+        cols["gc"] = self.gc_ms[:n]; cols["alloc"] = self.blocks[:n]
+        out = {k: np.percentile(v, (50, 95, 99)).tolist() for k, v in cols.items()}
+        lat = latency.stats()
+        if lat: out["input"] = lat[1]   # the overlay shows the upper bound
+        return out
 
-    def update(self, dt):
-        w, h = screen.get_size()
-        keys = pygame.key.get_pressed()
-        if keys[pygame.K_LEFT]:  self.rect.x -= int(self.speed * dt)
-        if keys[pygame.K_RIGHT]: self.rect.x += int(self.speed * dt)
-        self.rect.x = max(0, min(self.rect.x, w - self.rect.width))
-        if self.has_shield:
-            self.shield_time_left = max(0.0, self.shield_time_left - dt)
-            if self.shield_time_left == 0: self.has_shield = False
-        if self.magnet_time_left > 0:
-            self.magnet_time_left = max(0.0, self.magnet_time_left - dt)
-
-    def draw(self, surf):
-        pygame.draw.rect(surf, BLUE, self.rect, border_radius=8)
-        if self.has_shield:
-            r = self.rect.inflate(16,16); pygame.draw.rect(surf, OK, r, width=2, border_radius=12)
-        if self.magnet_time_left > 0:
-            r = self.rect.inflate(26,26); pygame.draw.rect(surf, ORANGE, r, width=1, border_radius=14)
-
-class Bomb:
-    __slots__ = ("rect","vy")
-    def __init__(self, x, vy):
-        self.rect = pygame.Rect(x, -BOMB_SIZE, BOMB_SIZE, BOMB_SIZE)
-        self.vy = vy
-    def update(self, dt, slow=1.0): self.rect.y += int(self.vy * slow * dt)
-    def draw(self, surf): pygame.draw.rect(surf, DANGER, self.rect, border_radius=6)
-
-class Coin:
-    __slots__ = ("x","y","vx","vy","r")
-    def __init__(self, x):
-        self.x = float(x); self.y = float(-18)
-        self.vx = 0.0; self.vy = COIN_VY; self.r = 10
-    @property
-    def rect(self): return pygame.Rect(int(self.x - self.r), int(self.y - self.r), self.r*2, self.r*2)
-    def update(self, dt, player_center=None, magnet=False):
-        ax=ay=0.0
-        if magnet and player_center:
-            px, py = player_center
-            dx, dy = px - self.x, py - self.y
-            dist = max(1.0, (dx*dx + dy*dy) ** 0.5)
-            ax += COIN_MAGNET_ACCEL * dx / dist
-            ay += COIN_MAGNET_ACCEL * dy / dist
-        self.vx += ax*dt; self.vy += ay*dt
-        speed = (self.vx*self.vx + self.vy*self.vy) ** 0.5
-        if speed > COIN_MAX_SPEED:
-            k = COIN_MAX_SPEED / speed; self.vx*=k; self.vy*=k
-        if not magnet: self.vy = max(self.vy, COIN_VY)
-        self.x += self.vx*dt; self.y += self.vy*dt
     def draw(self, surf):
-        pygame.draw.circle(surf, GOLD, (int(self.x), int(self.y)), self.r)
-        pygame.draw.circle(surf, (255,230,120), (int(self.x), int(self.y)), self.r, width=2)
+        if not self.overlay: return
+        w, h = surf.get_size()
+        box = pygame.Rect(8, h - 280, PROFILE_GRAPH * 2 + 16, 272)
+        if self.panel is None or self.panel.get_size() != box.size:
+            self.panel = pygame.Surface(box.size, pygame.SRCALPHA); self.panel.fill((255, 255, 255, 215))
+        surf.blit(self.panel, box)
+        renderer.mark([box])
+        # stacked bar per frame, newest on the right; the line is the frame cap's budget
+        budget = 1000.0 / (frame_cap() or FPS)
+        graph = pygame.Rect(box.x + 8, box.y + 8, PROFILE_GRAPH * 2, 72)
+        scale = graph.h / (2 * budget)
+        last = (self.frames - 1 - np.arange(min(self.frames, PROFILE_GRAPH))) % PROFILE_FRAMES
+        rows = self.hist[last]
+        bars = np.stack([rows[:, idx].sum(axis=1) for idx in self.groups.values()], axis=1) * scale
+        colors = [GROUP_COLORS[g] for g in self.groups]
+        for k, bar in enumerate(bars.tolist()):
+            x = graph.right - 2*k - 2; y = graph.bottom
+            for c, v in zip(colors, bar):
+                if v < 0.5: continue
+                top = max(graph.y, y - v)
+                pygame.draw.line(surf, c, (x, y), (x, top)); y = top
+        by = graph.bottom - int(budget * scale)
+        pygame.draw.line(surf, DANGER, (graph.x, by), (graph.right, by))
+        s = self.summary or {}
+        y = graph.bottom + 6
+        text("ms       p50 / p95 / p99", graph.x, y, MUTED); y += 18
+        for k in ("frame",) + PROFILE_GROUPS + ("input",):
+            if k not in s: continue
+            text(k, graph.x, y, GROUP_COLORS.get(k, TEXT))
+            text_num("", "{:.2f} / {:.2f} / {:.2f}".format(*s[k]), graph.x + 72, y); y += 18
+        text_num("dropped ", f"{self.dropped}/{self.frames}", graph.x, y, DANGER); y += 18
+        if "gc" in s:
+            text_num("gc p99 ", f"{s['gc'][2]:.2f} ms  alloc p50 {s['alloc'][0]:+.0f} blk/frame", graph.x, y, MUTED)
+
+    def close(self):
+        if self.log is not None:
+            self.log.close(); self.log = None
+        self.on = self.overlay
+
+profiler = FrameProfiler()
+
+LATENCY_SAMPLES = 600   # rolling window for the input-to-flip percentiles
+
+class InputLatency:
+    # Key press (or release) to the flip of the first frame that acts on it. An event
+    # carries no timestamp, so a batch is stamped when the loop fetches it: the key went
+    # down between the previous fetch and this one. Each sample is kept as that range,
+    # lo (fetch to flip) and hi (previous fetch to flip). In RUNNING a frame that ran no
+    # sim step hasn't read the keys yet and the input waits for the next one; a frame
+    # that draws nothing drops it, as nothing it could show changed
+    def __init__(self):
+        self.lo = np.zeros(LATENCY_SAMPLES)
+        self.hi = np.zeros(LATENCY_SAMPLES)
+        self.n = 0
+        self.t_poll = time.perf_counter()
+        self.seen = self.since = None   # the oldest input not flipped yet
+        self.sample = None              # (lo, hi) ms when this frame's flip ended one
+
+    def poll(self, events):
+        now = time.perf_counter()
+        self.sample = None
+        if self.seen is None:
+            for e in events:
+                if e.type == pygame.KEYDOWN or e.type == pygame.KEYUP:
+                    self.seen, self.since = now, self.t_poll; break
+        self.t_poll = now
+
+    def flip(self, drawn, read):
+        # after the frame's present, or where it would have been; read: whether the frame has
+        # acted on the input yet (always, outside RUNNING)
+        if self.seen is None or (drawn and not read): return
+        if drawn:
+            now = time.perf_counter()
+            self.sample = lo, hi = (now - self.seen) * 1000.0, (now - self.since) * 1000.0
+            i = self.n % LATENCY_SAMPLES
+            self.lo[i] = lo; self.hi[i] = hi; self.n += 1
+        self.seen = self.since = None
+
+    def stats(self):
+        # p50/p95/p99 in ms of each bound, or None before the first sample
+        n = min(self.n, LATENCY_SAMPLES)
+        if not n: return None
+        return (np.percentile(self.lo[:n], (50, 95, 99)).tolist(), np.percentile(self.hi[:n], (50, 95, 99)).tolist())
+
+    def report(self):
+        st = self.stats()
+        if st is None: return "input: no samples"
+        (a, b, c), (d, e, f) = st
+        return (f"input-to-flip over {min(self.n, LATENCY_SAMPLES)} inputs, ms p50/p95/p99: "
+                f"{a:.1f}-{d:.1f} / {b:.1f}-{e:.1f} / {c:.1f}-{f:.1f}")
+
+latency = InputLatency()
+
+CAPTURE_ENV = "BOMBDASH_CAPTURE"              # a directory (PNG sequence) or a .raw file (RGB24 video); starts capture
+CAPTURE_EVERY_ENV = "BOMBDASH_CAPTURE_EVERY"  # keep every Nth drawn frame
+CAPTURE_SLOTS = 8                             # frames waiting for the writer; more than that are dropped
+CAPTURE_DIR = Path("captures")                # F9 recordings go into a timestamped directory here
+CAPTURE_PNG_LEVEL = 1                         # zlib level: capture has to keep up, size matters less
+
+def _png_chunk(kind, data):
+    return len(data).to_bytes(4, "big") + kind + data + zlib.crc32(kind + data).to_bytes(4, "big")
+
+def encode_png(rows, w, h):
+    # rows: (h, 1 + 3w) uint8, a zero filter byte then RGB per row. zlib releases the GIL
+    # while it compresses, which pygame.image.save does not, so the main thread keeps running
+    head = w.to_bytes(4, "big") + h.to_bytes(4, "big") + bytes((8, 2, 0, 0, 0))   # 8-bit RGB
+    return (b"\x89PNG\r\n\x1a\n" + _png_chunk(b"IHDR", head)
+            + _png_chunk(b"IDAT", zlib.compress(rows.data, CAPTURE_PNG_LEVEL)) + _png_chunk(b"IEND", b""))
+
+class FrameCapture:
+    # grab() copies the display into one of CAPTURE_SLOTS preallocated buffers and queues
+    # it; converting and writing happen on a daemon thread. When every buffer is still
+    # waiting for the writer, the frame is dropped and counted: the main loop never waits
+    def __init__(self):
+        self.path = None; self.raw = None
+        self.every = 1; self.tick = 0
+        self.frames = self.dropped = 0
+        self.written = self.failed = 0; self.error = None   # the writer's, for the capture it is on
+        self.slots = []; self.free = []
+        self.rgb = None    # byte offsets of R, G, B in a display pixel
+        self.queue = queue.Queue()
+        self.thread = None
+
+    def toggle(self):
+        if self.path is None: self.start(CAPTURE_DIR / time.strftime("%Y%m%d-%H%M%S"))
+        else: self.stop()
+
+    def start(self, path, every=1):
+        self.stop()
+        path = Path(path)
+        try:
+            if path.suffix == ".raw":
+                path.parent.mkdir(parents=True, exist_ok=True)
+                self.raw = open(path, "wb")
+            else:
+                path.mkdir(parents=True, exist_ok=True)
+        except OSError as e:
+            print(f"capture: can't write {path}: {e}", file=sys.stderr)
+            return
+        self.path = path; self.every = max(1, every); self.tick = 0
+        self.frames = self.dropped = 0
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, name="frame-capture", daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        # the writer finishes what is queued, then closes the file and reports
+        if self.path is None: return
+        self.queue.put((None, self.path, self.raw, (self.frames, self.dropped)))
+        self.path = self.raw = None
+
+    def close(self):
+        # quit: stop and wait for the writer
+        self.stop()
+        self.queue.join()
+
+    def grab(self, surf):
+        if self.path is None: return
+        self.tick += 1
+        if (self.tick - 1) % self.every: return
+        w, h = surf.get_size()
+        if not self.slots or self.slots[0].shape != (h, w):
+            if len(self.free) < len(self.slots): self.dropped += 1; return   # resized while frames are queued
+            self.slots = [np.empty((h, w), np.uint32) for _ in range(CAPTURE_SLOTS)]
+            self.free = list(range(CAPTURE_SLOTS))
+            offs = [sh // 8 for sh in surf.get_shifts()[:3]]
+            self.rgb = offs if sys.byteorder == "little" else [3 - o for o in offs]
+        if not self.free: self.dropped += 1; return
+        i = self.free.pop()
+        px = pygame.surfarray.pixels2d(surf)   # locks the surface: a view of its pixels, not a copy
+        np.copyto(self.slots[i], px.T); del px
+        self.frames += 1
+        self.queue.put((i, self.path, self.raw, self.frames))
+
+    def _run(self):
+        while True:
+            i, path, raw, n = self.queue.get()
+            try:
+                if i is None:
+                    # everything queued before this belonged to the capture being stopped
+                    frames, dropped = n
+                    h, w = self.slots[0].shape if self.slots else (0, 0)
+                    if raw is not None: raw.close()
+                    print(f"capture: {self.written}/{frames} frames written ({w}x{h}) -> {path}, "
+                          f"{dropped} dropped, {self.failed} failed"
+                          + (f" (first error: {self.error})" if self.error else ""), file=sys.stderr)
+                    self.written = self.failed = 0; self.error = None
+                    continue
+                slot = self.slots[i]
+                h, w = slot.shape
+                rows = np.zeros((h, 1 + 3*w), np.uint8)   # PNG layout; raw video skips the filter column
+                try:
+                    rows[:, 1:].reshape(h, w, 3)[:] = slot.view(np.uint8).reshape(h, w, 4)[:, :, self.rgb]
+                finally:
+                    self.free.append(i)   # copied out: the slot can take the next frame
+                if raw is not None: raw.write(np.ascontiguousarray(rows[:, 1:]).data)
+                else: (path / f"frame_{n:06d}.png").write_bytes(encode_png(rows, w, h))
+                self.written += 1
+            except Exception as e:
+                # a full disk or a file gone read-only: keep counting, say so at stop
+                self.failed += 1
+                if self.error is None: self.error = e
+            finally:
+                self.queue.task_done()
+
+capture = FrameCapture()
 
-class PowerUp:
-    TYPES = ("shield", "slow", "clear", "magnet")
-    COLORS = {"shield": OK, "slow": ORANGE, "clear": PURPLE, "magnet": (90, 200, 255)}
-    def __init__(self, kind, x, vy=150):
-        self.kind = kind
-        self.rect = pygame.Rect(x, -26, 26, 26)
-        self.vy = vy
-    def update(self, dt): self.rect.y += int(self.vy * dt)
-    def apply(self, game):
-        if self.kind == "shield":
-            game.player.has_shield = True
-            game.player.shield_time_left = SHIELD_TIME + 2*save.upgrades.get("shield",0)
-        elif self.kind == "slow":
-            game.slow_time_left = SLOW_TIME
-        elif self.kind == "clear":
-            if game.bombs:
-                for b in game.bombs: game.pop_particles(b.rect.centerx, b.rect.centery, color=PURPLE)
-            game.bombs.clear()
-        elif self.kind == "magnet":
-            game.player.magnet_time_left = MAGNET_TIME + 2*save.upgrades.get("magnet",0)
-    def draw(self, surf):
-        c = self.COLORS[self.kind]
-        pygame.draw.ellipse(surf, c, self.rect)
-        if self.kind == "clear":
-            text(BOMB_CLEAN_LABEL, self.rect.centerx, self.rect.centery-10, (255,255,255), center=True)
+BOMB_CLEAN_LABEL = "Ω"
+POWERUP_COLORS = {"shield": OK, "slow": ORANGE, "clear": PURPLE, "magnet": (90, 200, 255)}
+POP_COLORS = dict(POWERUP_COLORS, second=(80,80,80), coin=GOLD)
+
+PARTICLE_CAP   = 4000
+PARTICLE_LIFE  = (0.5, 0.9)
+PARTICLE_SIZES = (2, 3, 4)
+PARTICLE_GRAVITY = 380.0
+ALPHA_STEPS    = 32
+
+class ParticleSystem:
+    # struct-of-arrays particles; live ones are packed into [0, n)
+    def __init__(self, cap=PARTICLE_CAP):
+        self.cap = cap
+        self.n = 0
+        self.pos  = np.zeros((cap, 2), np.float32)
+        self.vel  = np.zeros((cap, 2), np.float32)
+        self.life = np.zeros(cap, np.float32)
+        self.kind = np.zeros(cap, np.int32)      # (palette index, size) packed, see _sprite_base
+        self.rng = np.random.default_rng()
+        self.palette = {}
+        self.sprites = []
+        self.scaled = {}   # render scale -> self.sprites shrunk to match, as SpriteAtlas.get does
+
+    def __len__(self): return self.n
+
+    def clear(self): self.n = 0
+
+    def _sprite_base(self, color):
+        idx = self.palette.get(color)
+        if idx is None:
+            idx = self.palette[color] = len(self.palette)
+            for size in PARTICLE_SIZES:
+                for step in range(ALPHA_STEPS):
+                    sp = pygame.Surface((size, size), pygame.SRCALPHA)
+                    sp.fill((*color, int(255 * (step+1) / ALPHA_STEPS)))
+                    self.sprites.append(sp)
+        return idx * len(PARTICLE_SIZES)
+
+    def emit(self, x, y, count, color, limit=None):
+        # limit: live particles allowed, below the cap (the quality governor's tiers)
+        count = min(count, min(limit or self.cap, self.cap) - self.n)
+        if count <= 0: return
+        i, j, rng = self.n, self.n + count, self.rng
+        self.pos[i:j] = (x, y)
+        self.vel[i:j, 0] = rng.uniform(-120, 120, count)
+        self.vel[i:j, 1] = rng.uniform(-220, -60, count)
+        self.life[i:j] = rng.uniform(*PARTICLE_LIFE, count)
+        self.kind[i:j] = self._sprite_base(tuple(color)) + rng.integers(0, len(PARTICLE_SIZES), count)
+        self.n = j
 
-class Game:
+    def update(self, dt):
+        n = self.n
+        if not n: return
+        life = self.life[:n]
+        life -= dt
+        self.vel[:n, 1] += PARTICLE_GRAVITY * dt
+        self.pos[:n] += self.vel[:n] * dt
+        alive = life > 0
+        if not alive.all():
+            keep = np.flatnonzero(alive); k = len(keep)
+            for a in (self.pos, self.vel, self.life, self.kind): a[:k] = a[keep]
+            self.n = k
+
+    def bounds(self):
+        if not self.n: return None
+        pos = self.pos[:self.n].astype(np.int32)
+        (x0, y0), (x1, y1) = pos.min(0).tolist(), pos.max(0).tolist()
+        return pygame.Rect(x0, y0, x1 - x0 + max(PARTICLE_SIZES), y1 - y0 + max(PARTICLE_SIZES))
+
+    def _scaled(self, k):
+        sp = self.scaled.setdefault(k, [])
+        for s in self.sprites[len(sp):]:   # colours first used since the last call
+            size = max(1, round(s.get_width() * k))
+            sp.append(pygame.transform.scale(s, (size, size)))
+        return sp
+
+    def draw(self, surf, k=1.0):
+        n = self.n
+        if not n: return
+        step = np.minimum((self.life[:n] * (ALPHA_STEPS / PARTICLE_LIFE[1])).astype(np.int32), ALPHA_STEPS-1)
+        idx = (self.kind[:n] * ALPHA_STEPS + step).tolist()
+        sprites = self.sprites if k == 1.0 else self._scaled(k)
+        pos = self.pos[:n] if k == 1.0 else self.pos[:n] * k
+        surf.blits(zip([sprites[i] for i in idx], pos.astype(np.int32).tolist()), doreturn=False)
+
+def _bake(w, h, paint):
+    s = pygame.Surface((w, h), pygame.SRCALPHA)
+    paint(s)
+    return s.convert_alpha()
+
+def _paint_player(s, shield, magnet):
+    r = pygame.Rect(13, 13, PLAYER_SIZE, PLAYER_SIZE)
+    pygame.draw.rect(s, BLUE, r, border_radius=8)
+    if shield: pygame.draw.rect(s, OK, r.inflate(16,16), width=2, border_radius=12)
+    if magnet: pygame.draw.rect(s, ORANGE, r.inflate(26,26), width=1, border_radius=14)
+
+def _paint_coin(s):
+    pygame.draw.circle(s, GOLD, (COIN_R, COIN_R), COIN_R)
+    pygame.draw.circle(s, (255,230,120), (COIN_R, COIN_R), COIN_R, width=2)
+
+class SpriteAtlas:
+    # every entity look is rendered once into a display-format surface, so each kind is a
+    # single blits() call per frame; toggle_fullscreen clears it and it rebuilds on next use.
+    # Entries are (surface, (dx, dy)): blit at the entity's anchor + (dx, dy)
     def __init__(self):
-        self.reset_full()
-        self.best_time = save.best
-        self.coins_collected = 0
-
-    def reset_full(self):
-        self.apply_diff_profile()
-        self.player = Player()
-        self.bombs = []; self.powerups = []; self.particles = []; self.coins = []
-        self.time_alive = 0.0; self.diff_timer = 0.0
-        self.state = "MENU"  
-        self.slow_time_left = 0.0
-        self.coins_collected = 0
-        pygame.time.set_timer(NEW_BOMB, 0); pygame.time.set_timer(NEW_PWR, 0); pygame.time.set_timer(NEW_COIN, 0)
+        self.sprites = {}
+
+    def clear(self): self.sprites.clear()
+
+    def get(self, key, k=1.0):
+        # k < 1: the sprite shrunk for a lower render scale (coordinates scale by the same k)
+        spr = self.sprites.get((key, k))
+        if spr is None:
+            if k == 1.0:
+                spr = self.build(key)
+            else:
+                img, (dx, dy) = self.get(key)
+                w, h = img.get_size()
+                spr = pygame.transform.scale(img, (max(1, round(w*k)), max(1, round(h*k)))), (round(dx*k), round(dy*k))
+            self.sprites[(key, k)] = spr
+        return spr
+
+    def build(self, key):
+        kind = key[0]
+        if kind == "bomb":   # anchor: rect topleft
+            return _bake(BOMB_SIZE, BOMB_SIZE, lambda s: pygame.draw.rect(s, DANGER, (0, 0, BOMB_SIZE, BOMB_SIZE), border_radius=6)), (0, 0)
+        if kind == "coin":   # anchor: centre
+            return _bake(2*COIN_R + 1, 2*COIN_R + 1, _paint_coin), (-COIN_R, -COIN_R)
+        if kind == "player": # anchor: rect topleft; room for the magnet ring
+            return _bake(PLAYER_SIZE + 26, PLAYER_SIZE + 26, lambda s: _paint_player(s, *key[1:])), (-13, -13)
+        if kind == "powerup":  # anchor: rect topleft; the Ω label pokes out above the rect
+            ball = pygame.Rect(0, 0, 26, 26)
+            label = text_cache.render(BOMB_CLEAN_LABEL, pick_font(), (255,255,255)) if key[1] == "clear" else None
+            lr = label.get_rect(center=(ball.centerx, ball.centery-10)) if label else ball
+            box = ball.union(lr)
+            def paint(s):
+                pygame.draw.ellipse(s, POWERUP_COLORS[key[1]], ball.move(-box.x, -box.y))
+                if label: s.blit(label, lr.move(-box.x, -box.y))
+            return _bake(box.w, box.h, paint), box.topleft
+        raise KeyError(key)
+
+    def blits(self, surf, key, xy, k=1.0):
+        # xy: (n, 2) array of anchors in world coordinates
+        spr, off = self.get(key, k)
+        xy = xy.astype(np.int32) if k == 1.0 else (xy * k).astype(np.int32)
+        if off != (0, 0): xy += off
+        surf.blits([(spr, p) for p in xy.tolist()], doreturn=False)
+
+atlas = SpriteAtlas()
+
+class Game(Sim):
+    # pygame front end: reads the keyboard into an Input and renders the core's state
+    def __init__(self):
+        self.particles = ParticleSystem()
+        self.lap = profiler.lap
+        self.alpha = 1.0   # how far the frame is drawn from the previous sim step (0) to the last one (1)
+        super().__init__(screen.get_size(), save.difficulty, save.upgrades, save.best)
 
     def apply_diff_profile(self):
-        prof = DIFF_PROFILES.get(save.difficulty, DIFF_PROFILES["Normal"])
-        self.BOMB_SPEED0 = prof["BOMB_SPEED0"]; self.SPAWN_MS0 = prof["SPAWN_MS0"]
-        self.SPAWN_MIN_MS= prof["SPAWN_MIN_MS"]; self.STEP_V   = prof["STEP_V"]; self.STEP_SPAWN = prof["STEP_SPAWN"]
-        self.bomb_speed = self.BOMB_SPEED0; self.spawn_ms = self.SPAWN_MS0
+        self.difficulty = save.difficulty
+        super().apply_diff_profile()
+
+    def reset_full(self):
+        self.particles.clear()
+        super().reset_full()
 
     def start(self):
-        self.apply_diff_profile()
-        self.player = Player()
-        self.bombs.clear(); self.powerups.clear(); self.particles.clear(); self.coins.clear()
-        self.time_alive = 0.0; self.diff_timer = 0.0
-        self.slow_time_left = 0.0; self.coins_collected = 0
-        self.state = "RUNNING"
-        pygame.time.set_timer(NEW_BOMB, self.spawn_ms)
-        drop_bonus = save.upgrades.get("drops",0)
-        lo, hi = POWERUP_MS
-        hi = max(hi - 600*drop_bonus, lo+400)
-        pygame.time.set_timer(NEW_PWR, random.randint(lo, hi))
-        pygame.time.set_timer(NEW_COIN, COIN_MS)
+        self.size = screen.get_size()
+        self.particles.clear()
+        super().start(record=True)
+
+    def on_game_over(self):
+        save.best = self.best_time
+        save.coins_total += self.coins_collected
+        saver.flush(save)
+        ledger.append(run_record(self, "bomb"))
+        try:
+            self.replay.save(REPLAY_FILE)
+        except Exception:
+            pass
 
     def pop_particles(self, x, y, count=10, color=DANGER):
-        for _ in range(count): self.particles.append(Particle(x, y, color))
-
-    def bump_difficulty(self):
-        self.bomb_speed += self.STEP_V
-        self.spawn_ms = max(self.SPAWN_MIN_MS, self.spawn_ms - self.STEP_SPAWN)
-        pygame.time.set_timer(NEW_BOMB, self.spawn_ms)
+        t = governor.tier
+        self.particles.emit(x, y, max(1, int(count * t["burst"])), color, t["particles"])
 
     def update(self, dt):
         if self.state != "RUNNING": return
-        slow_factor = SLOW_FACTOR if self.slow_time_left > 0 else 1.0
-        if self.slow_time_left > 0: self.slow_time_left = max(0.0, self.slow_time_left - dt)
-        self.player.update(dt)
-        for b in self.bombs: b.update(dt, slow=slow_factor)
-        for p in self.powerups: p.update(dt)
-        magnet_on = self.player.magnet_time_left > 0
-        pc = self.player.rect.center
-        for c in self.coins: c.update(dt, player_center=pc, magnet=magnet_on)
-        for pr in self.particles: pr.update(dt)
-        self.particles = [p for p in self.particles if p.life > 0]
-        w, h = screen.get_size()
-        self.bombs    = [b for b in self.bombs if b.rect.top < h]
-        self.powerups = [p for p in self.powerups if p.rect.top < h]
-        self.coins    = [c for c in self.coins if c.y - c.r < h]
-
-        for b in list(self.bombs):
-            if b.rect.colliderect(self.player.rect):
-                if self.player.has_shield:
-                    self.player.has_shield = False; self.player.shield_time_left = 0.0
-                    self.bombs.remove(b); self.pop_particles(b.rect.centerx, b.rect.centery, color=OK)
-                elif self.player.second_chance_available:
-                    self.player.second_chance_available = False
-                    self.bombs.remove(b); self.pop_particles(b.rect.centerx, b.rect.centery, color=(80,80,80))
-                else:
-                    self.state = "GAME_OVER"
-                    self.best_time = max(self.best_time, self.time_alive)
-                    save.best = self.best_time
-                    save.coins_total += self.coins_collected
-                    save_save(save)
-                    pygame.time.set_timer(NEW_BOMB, 0); pygame.time.set_timer(NEW_PWR, 0); pygame.time.set_timer(NEW_COIN, 0)
-                break
-        for p in list(self.powerups):
-            if p.rect.colliderect(self.player.rect):
-                p.apply(self); self.powerups.remove(p)
-                self.pop_particles(p.rect.centerx, p.rect.centery, color=PowerUp.COLORS[p.kind])
-        for c in list(self.coins):
-            if c.rect.colliderect(self.player.rect):
-                self.coins.remove(c); self.coins_collected += 1
-                self.pop_particles(int(c.x), int(c.y), color=GOLD)
-
-        self.time_alive += dt; self.diff_timer += dt
-        if self.diff_timer >= DIFF_EVERY_S:
-            self.diff_timer = 0.0; self.bump_difficulty()
+        keys = pygame.key.get_pressed()
+        self.step(INPUTS[keys[pygame.K_LEFT] | keys[pygame.K_RIGHT] << 1], dt)
+        for x, y, kind in self.pops: self.pop_particles(x, y, color=POP_COLORS[kind])
+
+    def animate(self, dt):
+        # purely visual motion, once per drawn frame rather than per sim step
+        self.particles.update(dt)
+        self.lap("update.particles")
+
+    def lerp(self):
+        # where to draw things: `alpha` of the way from the state before the last step to the
+        # current one. The stores and the player keep how far each thing moved in that step.
+        back = 1.0 - self.alpha
+        b, c, p = self.bombs, self.coins, self.player
+        n = b.n
+        bombs = np.column_stack((b.x[:n], b.y[:n] - b.vy[:n] * (b.k * back)))
+        n = c.n; t = c.dt * back
+        coins = np.column_stack((c.x[:n] - c.vx[:n] * t, c.y[:n] - c.vy[:n] * t))
+        powerups = [(q.kind, q.rect.x, int(q.y - q.dy * back)) for q in self.powerups]
+        return bombs, coins, powerups, int(p.x - (p.x - p.prev_x) * back)
 
     def draw_hud(self):
         w, _ = screen.get_size()
         pygame.draw.rect(screen, (255,255,255,180), (0,0,w,64))
         pygame.draw.line(screen, OUTLINE, (0,64), (w,64), width=1)
-        text(f"Time: {self.time_alive:.1f}s", 16, 14)
-        text(f"Best: {self.best_time:.1f}s", 16, 36, MUTED)
-        text(f"Coins: {self.coins_collected}", w-150, 14, (120,95,0))
-        if self.slow_time_left > 0: text(f"Slow {self.slow_time_left:.1f}s", w-150, 36, WARN)
+        text_num("Time: ", f"{self.time_alive:.1f}s", 16, 14)
+        text_num("Best: ", f"{self.best_time:.1f}s", 16, 36, MUTED)
+        text_num("Coins: ", f"{self.coins_collected}", w-150, 14, (120,95,0))
+        if self.slow_time_left > 0: text_num("Slow ", f"{self.slow_time_left:.1f}s", w-150, 36, WARN)
         if self.player.has_shield:  text("Shield", w-260, 36, OK)
-        if self.player.magnet_time_left > 0: text(f"Magnet {self.player.magnet_time_left:.1f}s", w-260, 14, (90,200,255))
+        if self.player.magnet_time_left > 0: text_num("Magnet ", f"{self.player.magnet_time_left:.1f}s", w-260, 14, (90,200,255))
+        if governor.level: text(f"Quality: {governor.tier['name']}", 160, 36, MUTED)
+
+    def dirty_regions(self, view):
+        # where lerp() had things drawn this frame
+        bombs, coins, powerups, px = view
+        w, _ = screen.get_size()
+        pr = self.player.rect
+        rs = [pygame.Rect(0, 0, w, 65), pygame.Rect(px, pr.y, pr.w, pr.h).inflate(28, 28)]
+        rs += [pygame.Rect(x, y, BOMB_SIZE, BOMB_SIZE) for x, y in bombs.astype(int).tolist()]
+        rs += [pygame.Rect(x - COIN_R, y - COIN_R, 2*COIN_R + 1, 2*COIN_R + 1) for x, y in coins.astype(int).tolist()]
+        rs += [pygame.Rect(x - 2, y - 8, 30, 42) for _, x, y in powerups]
+        box = self.particles.bounds()
+        if box: rs.append(box)
+        return rs
 
     def draw(self):
-        draw_gradient_bg(screen)
-        for b in self.bombs: b.draw(screen)
-        for p in self.powerups: p.draw(screen)
-        for c in self.coins: c.draw(screen)
-        self.player.draw(screen)
-        for pr in self.particles: pr.draw(screen)
+        lap = self.lap
+        scale = save.render_scale
+        if scale < 100:
+            # world into a smaller canvas, upscaled once; the HUD stays at native resolution.
+            # The upscale rewrites every pixel, so present the whole frame
+            world = world_canvas(scale)
+            draw_gradient_bg(world)
+            renderer.invalidate()
+        elif renderer.partial:
+            world = screen
+            bg = gradient_bg(screen.get_size())
+            for r in renderer.prev: screen.blit(bg, r, r)
+        else:
+            world = screen
+            draw_gradient_bg(screen)
+        lap("draw.bg")
+        view = self.lerp()
+        self.draw_world(world, scale / 100.0, view)
+        if world is not screen:
+            pygame.transform.scale(world, screen.get_size(), screen); lap("draw.upscale")
         self.draw_hud()
+        renderer.mark(self.dirty_regions(view)); lap("draw.hud")
 
         if self.state == "PAUSED":
             self.draw_center_message("PAUSED", "Press P to resume")
         if self.state == "GAME_OVER":
             self.draw_center_message("GAME OVER", f"Coins: {self.coins_collected}   R — restart   Esc — menu", color=DANGER)
+        lap("draw.ui")
+
+    def draw_world(self, surf, k, view):
+        lap = self.lap
+        bombs, coins, powerups, px = view
+        if len(bombs): atlas.blits(surf, ("bomb",), bombs, k)
+        lap("draw.bombs")
+        for kind in PowerUp.TYPES:
+            tl = [(x, y) for q, x, y in powerups if q == kind]
+            if tl: atlas.blits(surf, ("powerup", kind), np.array(tl), k)
+        lap("draw.powerups")
+        if len(coins): atlas.blits(surf, ("coin",), coins, k)
+        lap("draw.coins")
+        p = self.player
+        spr, (dx, dy) = atlas.get(("player", p.has_shield, p.magnet_time_left > 0), k)
+        surf.blit(spr, (int(px * k) + dx, int(p.rect.y * k) + dy)); lap("draw.player")
+        self.particles.draw(surf, k); lap("draw.particles")
 
     def draw_center_message(self, title, subtitle, color=TEXT):
         w, h = screen.get_size()
         panel = pygame.Rect(w//2-220, h//2-90, 440, 180)
         rounded_panel(panel)
+        renderer.mark([pygame.Rect(panel.x-6, panel.y, panel.w+12, panel.h+18)])   # panel + drop shadow
         text(title, panel.centerx, panel.y+36, color, big=True, center=True)
         text(subtitle, panel.centerx, panel.y+100, MUTED, center=True)
 
-    def spawn_bomb(self):
-        w, _ = screen.get_size()
-        x = random.randint(0, w - BOMB_SIZE)
-        self.bombs.append(Bomb(x, self.bomb_speed))
-
-    def spawn_powerup(self):
-        w, _ = screen.get_size()
-        kind = random.choice(PowerUp.TYPES)
-        x = random.randint(24, w - 50)
-        self.powerups.append(PowerUp(kind, x))
-        drop_bonus = save.upgrades.get("drops",0)
-        lo, hi = POWERUP_MS
-        hi = max(hi - 600*drop_bonus, lo+400)
-        pygame.time.set_timer(NEW_PWR, random.randint(lo, hi))
-
-    def spawn_coin(self):
-        w, _ = screen.get_size()
-        x = random.randint(20, w - 20)
-        self.coins.append(Coin(x))
-
-SHOP_ITEMS = [
-    ("shield", "Shield+", "Shield lasts +2s per level", 3, 15, 10),
-    ("magnet", "Magnet+", "Magnet lasts +2s per level", 3, 15, 10),
-    ("drops",  "Drops+",  "Power-ups drop more often",   3, 20, 12),
-    ("second", "Second Chance", "One extra life per run", 1, 40, 0),
-]
-
-def upgrade_cost(key, lvl):
-    _,_,_,max_lvl, base, step = next(x for x in SHOP_ITEMS if x[0]==key)
-    if lvl>=max_lvl: return None
-    return base + step*lvl
-
-def draw_menu(game, WIDTH, HEIGHT):
-    draw_gradient_bg(screen)
+IDLE_WAIT_MS = 250   # menus block on input for up to this long once nothing is changing
+
+class UIView:
+    # retained menu screen: build(*args) -> (layer, widgets) makes the widgets and the static
+    # layer (background, panels, fixed text) once per `key`; a frame is only redrawn when
+    # the key, a widget's look (hover, value) or a full invalidate asks for it
+    def __init__(self, build):
+        self.build = build
+        self.reset()
+
+    def reset(self):
+        self.key = None; self.layer = None; self.widgets = {}; self.items = []
+        self.shown = None
+
+    def draw(self, key, *args):
+        # -> (widgets, drawn)
+        if key != self.key:
+            self.layer, self.widgets = self.build(*args)
+            self.items = [w[0] if isinstance(w, tuple) else w for w in self.widgets.values()]
+            self.key = key; self.shown = None
+        mpos = pygame.mouse.get_pos()
+        look = [w.look(mpos) for w in self.items]
+        if look == self.shown and not renderer.full: return self.widgets, False
+        screen.blit(self.layer, (0, 0))
+        for w in self.items: w.draw(mpos)
+        self.shown = look
+        renderer.invalidate()   # whole-screen redraw: present it with a full flip
+        return self.widgets, True
+
+def _layer(WIDTH, HEIGHT):
+    layer = pygame.Surface((WIDTH, HEIGHT)).convert()
+    draw_gradient_bg(layer)
+    return layer
+
+def build_menu(game, WIDTH, HEIGHT):
+    layer = _layer(WIDTH, HEIGHT)
     panel_w = min(520, WIDTH - 40)
     panel_h = min(520, HEIGHT - 140)
     panel = pygame.Rect((WIDTH-panel_w)//2, (HEIGHT-panel_h)//2, panel_w, panel_h)
-    rounded_panel(panel)
+    rounded_panel(panel, surf=layer)
 
-    text("DODGE!", panel.centerx, panel.y+36, big=True, center=True)
-    text("← → to move   Enter to start", panel.centerx, panel.y+110, MUTED, center=True)
-    text("S = Settings   H = Shop   Esc = Quit", panel.centerx, panel.y+140, MUTED, center=True)
+    text("DODGE!", panel.centerx, panel.y+36, big=True, center=True, surf=layer)
+    text("← → to move   Enter to start", panel.centerx, panel.y+110, MUTED, center=True, surf=layer)
+    text("S = Settings   H = Shop   Esc = Quit", panel.centerx, panel.y+140, MUTED, center=True, surf=layer)
 
-    text(f"Best: {game.best_time:.1f}s", panel.x+32, panel.y+190, mid=True)
-    text(f"Coins: {save.coins_total}", panel.x+32, panel.y+222, (120,95,0), mid=True)
+    text(f"Best: {game.best_time:.1f}s", panel.x+32, panel.y+190, mid=True, surf=layer)
+    text(f"Coins: {save.coins_total}", panel.x+32, panel.y+222, (120,95,0), mid=True, surf=layer)
+    runs, avg, best = ledger.summary(save.difficulty)
+    if runs:
+        text(f"{save.difficulty}: {runs} run{'s' if runs != 1 else ''}", panel.x+270, panel.y+196, MUTED, surf=layer)
+        text(f"avg {avg:.1f}s  best {best:.1f}s", panel.x+270, panel.y+226, MUTED, surf=layer)
 
-    text("Power-ups: Shield / Slow / Ω Clear / U Magnet", panel.centerx, panel.y+270, MUTED, center=True)
+    text("Power-ups: Shield / Slow / Ω Clear / U Magnet", panel.centerx, panel.y+270, MUTED, center=True, surf=layer)
 
-    mpos = pygame.mouse.get_pos()
     gap = 54
     y0 = panel.y + panel.h - (4*46 + 3*12) - 28
     btn_start   = Button(pygame.Rect(panel.centerx-110, y0,           220, 46), "START (Enter)")
     btn_settings= Button(pygame.Rect(panel.centerx-110, y0+gap,       220, 46), "Settings (S)", "ghost")
     btn_shop    = Button(pygame.Rect(panel.centerx-110, y0+2*gap,     220, 46), "Shop (H)", "ghost")
     btn_exit    = Button(pygame.Rect(panel.centerx-110, y0+3*gap,     220, 46), "Exit (Esc)", "danger")
-    for b in (btn_start, btn_settings, btn_shop, btn_exit): b.draw(mpos)
 
-    return {"start":btn_start, "settings":btn_settings, "shop":btn_shop, "exit":btn_exit}
+    return layer, {"start":btn_start, "settings":btn_settings, "shop":btn_shop, "exit":btn_exit}
 
-def draw_settings(WIDTH, HEIGHT):
-    draw_gradient_bg(screen)
+def build_settings(WIDTH, HEIGHT):
+    layer = _layer(WIDTH, HEIGHT)
     panel_w = min(520, WIDTH - 40)
-    panel_h = 420
+    panel_h = 540
     panel = pygame.Rect((WIDTH-panel_w)//2, (HEIGHT-panel_h)//2, panel_w, panel_h)
-    rounded_panel(panel)
-    text("SETTINGS", panel.centerx, panel.y+36, big=True, center=True)
+    rounded_panel(panel, surf=layer)
+    text("SETTINGS", panel.centerx, panel.y+36, big=True, center=True, surf=layer)
 
-    mpos = pygame.mouse.get_pos()
-    text("Difficulty", panel.x+36, panel.y+120, MUTED)
+    text("Difficulty", panel.x+36, panel.y+120, MUTED, surf=layer)
     sel = Select(pygame.Rect(panel.right-220, panel.y+110, 180, 36), ["Easy","Normal","Hard"],
                  ["Easy","Normal","Hard"].index(save.difficulty))
-    sel.draw(mpos)
 
-    text("Volume", panel.x+36, panel.y+178, MUTED)
+    text("Volume", panel.x+36, panel.y+178, MUTED, surf=layer)
     slider = Slider(pygame.Rect(panel.right-220, panel.y+170, 180, 36), save.volume/100.0)
-    slider.draw(mpos)
 
-    text("Fullscreen", panel.x+36, panel.y+236, MUTED)
+    text("Fullscreen", panel.x+36, panel.y+236, MUTED, surf=layer)
     fs_btn = Button(pygame.Rect(panel.right-220, panel.y+228, 180, 36), "Toggle", "ghost")
-    fs_btn.draw(mpos)
+
+    text("Dirty rects", panel.x+36, panel.y+294, MUTED, surf=layer)
+    dirty_btn = Button(pygame.Rect(panel.right-220, panel.y+286, 180, 36), "On" if save.dirty_rects else "Off", "ghost")
+
+    text("Render scale", panel.x+36, panel.y+352, MUTED, surf=layer)
+    scale_sel = Select(pygame.Rect(panel.right-220, panel.y+344, 180, 36), [f"{s}%" for s in RENDER_SCALES],
+                       RENDER_SCALES.index(save.render_scale))
+
+    text("Frame rate", panel.x+36, panel.y+410, MUTED, surf=layer)
+    fps_sel = Select(pygame.Rect(panel.right-220, panel.y+402, 180, 36), [f"{c} Hz" if c else "Vsync" for c in FRAME_CAPS],
+                     FRAME_CAPS.index(save.frame_cap))
 
     back = Button(pygame.Rect(panel.centerx-90, panel.bottom-64, 180, 44), "Back (Esc)")
-    back.draw(mpos)
 
-    return {"select":sel, "slider":slider, "fs":fs_btn, "back":back}
+    return layer, {"select":sel, "slider":slider, "fs":fs_btn, "dirty":dirty_btn, "scale":scale_sel, "fps":fps_sel, "back":back}
 
-def draw_shop(WIDTH, HEIGHT):
-    draw_gradient_bg(screen)
+def build_shop(WIDTH, HEIGHT):
+    layer = _layer(WIDTH, HEIGHT)
     panel_w = min(540, WIDTH - 40)
     panel_h = min(560, HEIGHT - 120)
     panel = pygame.Rect((WIDTH-panel_w)//2, (HEIGHT-panel_h)//2, panel_w, panel_h)
-    rounded_panel(panel)
-    text("SHOP", panel.centerx, panel.y+36, big=True, center=True)
-    text(f"Coins: {save.coins_total}", panel.x+32, panel.y+84, (120,95,0), mid=True)
+    rounded_panel(panel, surf=layer)
+    text("SHOP", panel.centerx, panel.y+36, big=True, center=True, surf=layer)
+    text(f"Coins: {save.coins_total}", panel.x+32, panel.y+84, (120,95,0), mid=True, surf=layer)
 
-    mpos = pygame.mouse.get_pos()
     buttons = {}
     y = panel.y + 120
     card_h = 92
     for key,title,desc,max_lvl,_,_ in SHOP_ITEMS:
         lvl = save.upgrades.get(key,0)
         card = pygame.Rect(panel.x+20, y, panel.w-40, card_h)
-        rounded_panel(card, radius=12, shadow=False)
-        text(f"{title}  (Lv {lvl}/{max_lvl})", card.x+16, card.y+12, mid=True)
-        text(desc, card.x+16, card.y+48, MUTED)
+        rounded_panel(card, radius=12, shadow=False, surf=layer)
+        text(f"{title}  (Lv {lvl}/{max_lvl})", card.x+16, card.y+12, mid=True, surf=layer)
+        text(desc, card.x+16, card.y+48, MUTED, surf=layer)
 
         cost = upgrade_cost(key, lvl)
         label = "MAXED" if cost is None else f"Buy — {cost}c"
         kind = "ghost" if cost is None or cost>save.coins_total else "primary"
         btn = Button(pygame.Rect(card.right-140, card.y+24, 120, 42), label, kind)
-        btn.draw(mpos)
         buttons[key] = (btn, cost)
         y += card_h + 12
 
     back = Button(pygame.Rect(panel.centerx-90, panel.bottom-60, 180, 44), "Back (Esc)")
-    back.draw(mpos)
     buttons["back"] = (back, None)
-    return buttons
+    return layer, buttons
 
-def main():
+menu_ui = UIView(build_menu)
+settings_ui = UIView(build_settings)
+shop_ui = UIView(build_shop)
+
+# each returns (widgets, drawn); drawn is False when the screen already shows this frame
+
+def draw_menu(game, WIDTH, HEIGHT):
+    return menu_ui.draw((WIDTH, HEIGHT, game.best_time, save.coins_total, save.difficulty, ledger.stats["runs"]),
+                        game, WIDTH, HEIGHT)
+
+def draw_settings(WIDTH, HEIGHT):
+    return settings_ui.draw((WIDTH, HEIGHT, save.dirty_rects), WIDTH, HEIGHT)
+
+def draw_shop(WIDTH, HEIGHT):
+    return shop_ui.draw((WIDTH, HEIGHT, save.coins_total, tuple(save.upgrades.items())), WIDTH, HEIGHT)
+
+# input event types each state acts on; the rest of INPUT_EVENTS is blocked, so SDL
+# drops them before they reach the queue. A run reads movement from the keyboard state,
+# which SDL keeps current whether or not key events are queued: KEYUP is let through only
+# for the latency stamps. Window and system events are never filtered
+INPUT_EVENTS = (pygame.KEYDOWN, pygame.KEYUP, pygame.TEXTINPUT, pygame.TEXTEDITING,
+                pygame.MOUSEMOTION, pygame.MOUSEBUTTONDOWN, pygame.MOUSEBUTTONUP, pygame.MOUSEWHEEL,
+                pygame.FINGERDOWN, pygame.FINGERUP, pygame.FINGERMOTION)
+UI_EVENTS = (pygame.KEYDOWN, pygame.MOUSEBUTTONDOWN, pygame.MOUSEBUTTONUP, pygame.MOUSEMOTION)   # motion: hover
+STATE_EVENTS = {"MENU": UI_EVENTS, "SETTINGS": UI_EVENTS, "SHOP": UI_EVENTS,
+                "RUNNING": (pygame.KEYDOWN, pygame.KEYUP),
+                "PAUSED": (pygame.KEYDOWN,), "GAME_OVER": (pygame.KEYDOWN,)}
+
+def filter_events(state):
+    allowed = STATE_EVENTS[state]
+    pygame.event.set_blocked([t for t in INPUT_EVENTS if t not in allowed])   # also drops those already queued
+    pygame.event.set_allowed(allowed)
+
+def goto(state):
+    def action(game): game.state = state
+    return action
+
+def abandon_run(game):
+    ledger.append(run_record(game, "quit"))
+    game.reset_full()
+
+def fullscreen(game):
+    global screen
+    screen = toggle_fullscreen()
+
+# menu keys and buttons name the same actions
+MENU_ACTIONS = {"start": Game.start, "settings": goto("SETTINGS"), "shop": goto("SHOP"),
+                "exit": lambda game: quit_game()}
+MENU_KEYS = {pygame.K_RETURN: "start", pygame.K_KP_ENTER: "start", pygame.K_s: "settings",
+             pygame.K_h: "shop", pygame.K_ESCAPE: "exit"}
+PLAY_KEYS = {("RUNNING", pygame.K_p): goto("PAUSED"), ("PAUSED", pygame.K_p): goto("RUNNING"),
+             ("GAME_OVER", pygame.K_r): Game.start,
+             ("RUNNING", pygame.K_ESCAPE): abandon_run, ("PAUSED", pygame.K_ESCAPE): abandon_run,
+             ("GAME_OVER", pygame.K_ESCAPE): Game.reset_full,
+             ("RUNNING", pygame.K_f): fullscreen, ("PAUSED", pygame.K_f): fullscreen,
+             ("GAME_OVER", pygame.K_f): fullscreen}
+
+def on_menu(game, event, ui):
+    if event.type == pygame.KEYDOWN and event.key in MENU_KEYS:
+        MENU_ACTIONS[MENU_KEYS[event.key]](game)
+    elif event.type == pygame.MOUSEBUTTONDOWN and event.button == 1 and ui:
+        for name, action in MENU_ACTIONS.items():
+            if ui[name].clicked(event):
+                action(game); break
+
+def on_settings(game, event, ui):
     global screen
+    if event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE:
+        game.state = "MENU"
+    if ui:
+        ui["slider"].handle(event)
+        if ui["fs"].clicked(event):
+            screen = toggle_fullscreen()
+        if ui["dirty"].clicked(event):
+            save.dirty_rects = not save.dirty_rects
+        if event.type == pygame.MOUSEBUTTONDOWN and event.button==1:
+            ui["select"].handle(event)
+            ui["scale"].handle(event)
+            ui["fps"].handle(event)
+            if ui["back"].clicked(event): game.state = "MENU"
+    save.volume = int(round((ui["slider"].value if ui else save.volume/100.0)*100))
+    set_music_volume(save.volume)
+    opts = ["Easy","Normal","Hard"]
+    save.difficulty = opts[ui["select"].selected] if ui else save.difficulty
+    save.render_scale = RENDER_SCALES[ui["scale"].selected] if ui else save.render_scale
+    cap = FRAME_CAPS[ui["fps"].selected] if ui else save.frame_cap
+    if cap != save.frame_cap:
+        reopen = (cap == 0) != (save.frame_cap == 0)   # vsync is a property of the window
+        save.frame_cap = cap
+        if reopen: screen = reopen_window()
+    save_save(save)
+
+def on_shop(game, event, ui):
+    if event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE:
+        game.state = "MENU"
+    if ui and event.type == pygame.MOUSEBUTTONDOWN and event.button==1:
+        if ui["back"][0].clicked(event):
+            game.state = "MENU"
+        else:
+            for key in ("shield","magnet","drops","second"):
+                btn, cost = ui[key]
+                if cost is not None and btn.clicked(event) and save.coins_total >= cost:
+                    save.coins_total -= cost
+                    save.upgrades[key] = min(save.upgrades.get(key,0)+1,
+                                             next(x[3] for x in SHOP_ITEMS if x[0]==key))
+                    save_save(save)
+
+def on_play(game, event, ui):
+    if event.type == pygame.KEYDOWN:
+        action = PLAY_KEYS.get((game.state, event.key))
+        if action: action(game)
+
+EVENT_HANDLERS = {"MENU": on_menu, "SETTINGS": on_settings, "SHOP": on_shop,
+                  "RUNNING": on_play, "PAUSED": on_play, "GAME_OVER": on_play}
+def toggle_profiler():
+    profiler.toggle(); renderer.invalidate()
+
+GLOBAL_KEYS = {pygame.K_F3: toggle_profiler, pygame.K_F9: capture.toggle}   # in every state
+
+def main():
+    bootstrap()
     game = Game()
     ui_cache = {}
+    acc = 0.0
+    last_state = filtered = None
+    idle = False
 
     while True:
-        dt = clock.tick(FPS) / 1000.0
+        if game.state != filtered:
+            filter_events(game.state); filtered = game.state
+        dt = clock.tick(frame_cap() or VSYNC_MAX_HZ) / 1000.0
+        if idle:
+            # the last frame changed nothing: sleep until input arrives (or the idle tick)
+            first = pygame.event.wait(IDLE_WAIT_MS)
+            events = ([first] if first.type != pygame.NOEVENT else []) + pygame.event.get()
+            clock.tick()   # restart the frame clock: time spent waiting must not reach the next dt
+        else:
+            events = pygame.event.get()
+        latency.poll(events)
+        profiler.lap("wait")
         WIDTH, HEIGHT = screen.get_size()
-        mpos = pygame.mouse.get_pos()
 
-        for event in pygame.event.get():
+        for event in events:
             if event.type == pygame.QUIT:
-                pygame.quit(); sys.exit()
-
-            if game.state == "MENU":
-                if event.type == pygame.KEYDOWN:
-                    if event.key in (pygame.K_RETURN, pygame.K_KP_ENTER): game.start()
-                    elif event.key == pygame.K_s: game.state = "SETTINGS"
-                    elif event.key == pygame.K_h: game.state = "SHOP"
-                    elif event.key == pygame.K_ESCAPE: pygame.quit(); sys.exit()
-                if event.type == pygame.MOUSEBUTTONDOWN and event.button==1 and ui_cache:
-                    if ui_cache["start"].clicked(event): game.start()
-                    elif ui_cache["settings"].clicked(event): game.state = "SETTINGS"
-                    elif ui_cache["shop"].clicked(event): game.state = "SHOP"
-                    elif ui_cache["exit"].clicked(event): pygame.quit(); sys.exit()
-
-            elif game.state == "SETTINGS":
-                if event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE:
-                    game.state = "MENU"
-                if ui_cache:
-                    ui_cache["slider"].handle(event)
-                    if ui_cache["fs"].clicked(event):
-                        screen = toggle_fullscreen()
-                    if event.type == pygame.MOUSEBUTTONDOWN and event.button==1:
-                        ui_cache["select"].handle(event)
-                        if ui_cache["back"].clicked(event): game.state = "MENU"
-                save.volume = int(round((ui_cache["slider"].value if ui_cache else save.volume/100.0)*100))
-                pygame.mixer.music.set_volume(save.volume/100.0)
-                opts = ["Easy","Normal","Hard"]
-                save.difficulty = opts[ui_cache["select"].selected] if ui_cache else save.difficulty
-                save_save(save)
-
-            elif game.state == "SHOP":
-                if event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE:
-                    game.state = "MENU"
-                if ui_cache and event.type == pygame.MOUSEBUTTONDOWN and event.button==1:
-                    if ui_cache["back"][0].clicked(event):
-                        game.state = "MENU"
-                    else:
-                        for key in ("shield","magnet","drops","second"):
-                            btn, cost = ui_cache[key]
-                            if cost is not None and btn.clicked(event) and save.coins_total >= cost:
-                                save.coins_total -= cost
-                                save.upgrades[key] = min(save.upgrades.get(key,0)+1,
-                                                         next(x[3] for x in SHOP_ITEMS if x[0]==key))
-                                save_save(save)
-
-            elif game.state in ("RUNNING","PAUSED","GAME_OVER"):
-                if event.type == pygame.KEYDOWN:
-                    if event.key == pygame.K_p and game.state == "RUNNING": game.state = "PAUSED"
-                    elif event.key == pygame.K_p and game.state == "PAUSED": game.state = "RUNNING"
-                    elif event.key == pygame.K_r and game.state == "GAME_OVER": game.start()
-                    elif event.key == pygame.K_ESCAPE: game.reset_full()
-                    elif event.key == pygame.K_f: screen = toggle_fullscreen()
-                if event.type == NEW_BOMB and game.state == "RUNNING": game.spawn_bomb()
-                if event.type == NEW_PWR  and game.state == "RUNNING": game.spawn_powerup()
-                if event.type == NEW_COIN and game.state == "RUNNING": game.spawn_coin()
-
+                quit_game()
+            if event.type == pygame.KEYDOWN and event.key in GLOBAL_KEYS:
+                GLOBAL_KEYS[event.key]()
+            else:
+                EVENT_HANDLERS[game.state](game, event, ui_cache)
+
+        profiler.lap("events")
+        if game.state == "RUNNING": gc_control.hold()
+        else: acc = 0.0; gc_control.release()
+        # outside RUNNING nothing moves on its own: menus redraw when a widget's look changes,
+        # the pause/game-over overlays after input; everything while the profiler graph is up
+        if game.state != last_state or profiler.overlay: renderer.invalidate()
+        if events and game.state in ("PAUSED", "GAME_OVER"): renderer.invalidate()
+        if any(e.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED) for e in events): renderer.invalidate()
+        last_state = game.state
+
+        drawn = read = True
         if game.state == "MENU":
-            ui_cache = draw_menu(game, WIDTH, HEIGHT)
+            ui_cache, drawn = draw_menu(game, WIDTH, HEIGHT)
         elif game.state == "SETTINGS":
-            ui_cache = draw_settings(WIDTH, HEIGHT)
+            ui_cache, drawn = draw_settings(WIDTH, HEIGHT)
         elif game.state == "SHOP":
-            ui_cache = draw_shop(WIDTH, HEIGHT)
+            ui_cache, drawn = draw_shop(WIDTH, HEIGHT)
         elif game.state == "RUNNING":
             ui_cache = {}
-            game.update(dt); game.draw()
-        elif game.state == "PAUSED":
-            ui_cache = {}; game.draw()
-        elif game.state == "GAME_OVER":
-            ui_cache = {}; game.draw()
-
-        pygame.display.flip()
+            # the sim runs at SIM_HZ whatever the frame rate; the frame shows the state
+            # acc/SIM_DT of the way into the next step, interpolated from the last two
+            t0 = time.perf_counter()
+            acc = min(acc + dt, MAX_FRAME_S)
+            read = acc >= SIM_DT   # the keys are sampled by the sim step
+            while acc >= SIM_DT and game.state == "RUNNING":
+                game.update(SIM_DT); acc -= SIM_DT
+            game.alpha = acc / SIM_DT if game.state == "RUNNING" else 1.0
+            game.animate(dt)
+            game.draw()
+            if governor.frame((time.perf_counter() - t0) * 1000.0, 1000.0 / (frame_cap() or FPS)):
+                renderer.invalidate()   # the new tier's look everywhere from the next frame
+        else:   # PAUSED / GAME_OVER
+            ui_cache = {}; drawn = renderer.full
+            if drawn: game.draw()
+        profiler.lap("draw.ui")
+
+        # a recording keeps its frame rate through screens that don't change: no idle waits,
+        # and an undrawn frame is grabbed as the display still shows it
+        idle = not drawn and capture.path is None
+        if drawn:
+            profiler.draw(screen); profiler.lap("overlay")
+            renderer.present(); profiler.lap("present")
+        capture.grab(screen)
+        latency.flip(drawn, read)
+        profiler.end_frame()
 
 if __name__ == "__main__":
     main()
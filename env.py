@@ -0,0 +1,197 @@
+import argparse
+import os
+import time
+from multiprocessing import Pipe, Process
+
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import numpy as np
+
+from sim import BOMB_SIZE, INPUTS, PLAYER_SIZE, SIM_DT, SLOW_FACTOR, PowerUp, Sim
+
+# Agent API over N headless games in lockstep. An action is an INPUTS code per env
+# (0 none, 1 left, 2 right; 3, both keys, stands still). Observations are a dict of
+# float32 arrays with the env on axis 0:
+#   player    (N, len(PLAYER_OBS))
+#   bombs     (N, N_BOMBS, len(ITEM_OBS))     nearest to the player first;
+#   coins     (N, N_COINS, len(ITEM_OBS))     unused rows are all zero
+#   powerups  (N, N_POWERUPS, len(ITEM_OBS))
+# Positions are pixels relative to the player's center, velocities pixels/s.
+PLAYER_OBS = ("x", "shield", "magnet", "slow", "second", "time_alive")
+ITEM_OBS = ("present", "dx", "dy", "vx", "vy", "kind")   # kind: index into PowerUp.TYPES
+N_BOMBS, N_COINS, N_POWERUPS = 8, 4, 2
+
+def _nearest(out, env, dx, dy, vx, vy, kind=0.0):
+    # fill out[e] with the out.shape[1] items of env e closest to its player, for every env
+    # at once; item i belongs to env[i]
+    out[:] = 0.0
+    if not len(env): return
+    order = np.lexsort((dx*dx + dy*dy, env))        # by env, nearest first within each
+    env = env[order]
+    rank = np.arange(len(env)) - np.searchsorted(env, env)   # position within its env
+    keep = rank < out.shape[1]
+    o, e, r = order[keep], env[keep], rank[keep]
+    out[e, r, 0] = 1.0
+    out[e, r, 1] = dx[o]; out[e, r, 2] = dy[o]
+    out[e, r, 3] = vx[o] if isinstance(vx, np.ndarray) else vx
+    out[e, r, 4] = vy[o]
+    out[e, r, 5] = kind[o] if isinstance(kind, np.ndarray) else kind
+
+class _Shard:
+    # the games one process steps, and the buffers their results are written into.
+    # Env `first + i` plays seeds seed0 + first + i, then + total per finished episode.
+    def __init__(self, first, n, total, difficulty, upgrades, repeat, max_steps, coin_reward, death_penalty):
+        self.first, self.total = first, total
+        self.sims = [Sim(difficulty=difficulty, upgrades=dict(upgrades) if upgrades else None) for _ in range(n)]
+        self.repeat, self.max_steps = repeat, max_steps
+        self.coin_reward, self.death_penalty = coin_reward, death_penalty
+        self.obs = {"player": np.zeros((n, len(PLAYER_OBS)), np.float32),
+                    "bombs": np.zeros((n, N_BOMBS, len(ITEM_OBS)), np.float32),
+                    "coins": np.zeros((n, N_COINS, len(ITEM_OBS)), np.float32),
+                    "powerups": np.zeros((n, N_POWERUPS, len(ITEM_OBS)), np.float32)}
+        self.reward = np.zeros(n, np.float32)
+        self.done = np.zeros(n, bool)
+        # about the episode that just ended, where done is set
+        self.info = {"truncated": np.zeros(n, bool), "time_alive": np.zeros(n), "coins": np.zeros(n, np.int64)}
+        self.steps = [0] * n
+        self.episodes = [0] * n
+        self.seed0 = 0
+
+    def start(self, i):
+        self.sims[i].start(seed=self.seed0 + self.first + i + self.episodes[i] * self.total)
+        self.steps[i] = 0
+
+    def reset(self, seed0):
+        self.seed0 = seed0
+        self.episodes = [0] * len(self.sims)
+        for i in range(len(self.sims)): self.start(i)
+        self.observe()
+        self.reward[:] = 0.0; self.done[:] = False
+        return self.obs
+
+    def step(self, actions):
+        # finished envs start their next episode right away; the returned observation is its first
+        reward, done, info = self.reward, self.done, self.info
+        gain = self.repeat * SIM_DT
+        for i, (sim, a) in enumerate(zip(self.sims, actions)):
+            inp = INPUTS[a]; coins = sim.coins_collected
+            for _ in range(self.repeat):
+                sim.step(inp)
+                if sim.state != "RUNNING": break
+            self.steps[i] += 1
+            died = sim.state != "RUNNING"
+            reward[i] = (sim.coins_collected - coins) * self.coin_reward + (-self.death_penalty if died else gain)
+            over = died or self.steps[i] == self.max_steps
+            done[i] = over
+            if over:
+                info["truncated"][i] = not died
+                info["time_alive"][i] = sim.time_alive; info["coins"][i] = sim.coins_collected
+                self.episodes[i] += 1
+                self.start(i)
+        self.observe()
+        return self.obs, reward, done, info
+
+    def observe(self):
+        # every game's observation in a few array operations; Python only walks the games
+        # to collect their columns
+        sims, obs = self.sims, self.obs
+        obs["player"][:] = [(s.player.x, s.player.shield_time_left if s.player.has_shield else 0.0,
+                             s.player.magnet_time_left, s.slow_time_left, s.player.second_chance_available,
+                             s.time_alive) for s in sims]
+        cx = obs["player"][:, 0] + PLAYER_SIZE / 2
+        cy = np.array([s.player.rect.centery for s in sims], np.float32)
+        slow = np.array([SLOW_FACTOR if s.slow_time_left > 0 else 1.0 for s in sims], np.float32)
+        ids = np.arange(len(sims))
+        b = [s.bombs for s in sims]
+        env = np.repeat(ids, [x.n for x in b])
+        _nearest(obs["bombs"], env, np.concatenate([x.x[:x.n] for x in b]) + (BOMB_SIZE/2 - cx[env]),
+                 np.concatenate([x.y[:x.n] for x in b]) + (BOMB_SIZE/2 - cy[env]), 0.0,
+                 np.concatenate([x.vy[:x.n] for x in b]) * slow[env])
+        c = [s.coins for s in sims]
+        env = np.repeat(ids, [x.n for x in c])
+        _nearest(obs["coins"], env, np.concatenate([x.x[:x.n] for x in c]) - cx[env],
+                 np.concatenate([x.y[:x.n] for x in c]) - cy[env],
+                 np.concatenate([x.vx[:x.n] for x in c]), np.concatenate([x.vy[:x.n] for x in c]))
+        q = [(i, e.rect.centerx, e.y + e.rect.h/2, e.vy, PowerUp.TYPES.index(e.kind))
+             for i, s in enumerate(sims) for e in s.powerups]
+        q = np.array(q, np.float64).reshape(-1, 5)
+        env = q[:, 0].astype(np.intp)
+        _nearest(obs["powerups"], env, q[:, 1] - cx[env], q[:, 2] - cy[env], 0.0, q[:, 3], q[:, 4])
+
+def _worker(conn, args):
+    shard = _Shard(*args)
+    while True:
+        cmd, data = conn.recv()
+        if cmd == "step": conn.send(shard.step(data))
+        elif cmd == "reset": conn.send(shard.reset(data))
+        else: break
+    conn.close()
+
+class VecEnv:
+    # reset(seed) -> obs; step(actions) -> (obs, reward, done, info), gym-vector style with
+    # auto-reset. With workers > 1 the envs are split across that many processes.
+    # In-process, the returned arrays are reused by the next step: copy what you keep.
+    def __init__(self, num_envs, workers=1, difficulty="Normal", upgrades=None, repeat=1,
+                 max_steps=None, coin_reward=1.0, death_penalty=1.0):
+        self.num_envs = num_envs
+        workers = max(1, min(workers, num_envs))
+        cfg = (difficulty, upgrades, repeat, max_steps, coin_reward, death_penalty)
+        bounds = np.linspace(0, num_envs, workers + 1).astype(int).tolist()
+        shards = [(lo, hi - lo, num_envs) + cfg for lo, hi in zip(bounds, bounds[1:])]
+        self.bounds = bounds
+        self.shard = self.pipes = None
+        if workers == 1:
+            self.shard = _Shard(*shards[0])
+            return
+        self.pipes, self.procs = [], []
+        for args in shards:
+            parent, child = Pipe()
+            proc = Process(target=_worker, args=(child, args), daemon=True)
+            proc.start(); child.close()
+            self.pipes.append(parent); self.procs.append(proc)
+
+    def reset(self, seed=0):
+        if self.shard: return self.shard.reset(seed)
+        for c in self.pipes: c.send(("reset", seed))
+        return _concat([c.recv() for c in self.pipes])
+
+    def step(self, actions):
+        actions = np.asarray(actions).tolist()
+        if self.shard: return self.shard.step(actions)
+        for c, lo, hi in zip(self.pipes, self.bounds, self.bounds[1:]): c.send(("step", actions[lo:hi]))
+        parts = [c.recv() for c in self.pipes]
+        return (_concat([p[0] for p in parts]), np.concatenate([p[1] for p in parts]),
+                np.concatenate([p[2] for p in parts]), _concat([p[3] for p in parts]))
+
+    def close(self):
+        if not self.pipes: return
+        for c in self.pipes: c.send(("close", None))
+        for p in self.procs: p.join()
+        self.pipes = None
+
+def _concat(dicts):
+    return {k: np.concatenate([d[k] for d in dicts]) for k in dicts[0]}
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Measure BombDash agent API throughput with random actions")
+    ap.add_argument("-n", "--envs", type=int, default=64)
+    ap.add_argument("-j", "--workers", type=int, default=os.cpu_count())
+    ap.add_argument("--repeat", type=int, default=1, help="sim ticks per action")
+    ap.add_argument("--seconds", type=float, default=5.0)
+    args = ap.parse_args(argv)
+
+    env = VecEnv(args.envs, workers=args.workers, repeat=args.repeat)
+    rng = np.random.default_rng(0)
+    env.reset(seed=0)
+    steps = episodes = 0
+    t0 = time.perf_counter()
+    while time.perf_counter() - t0 < args.seconds:
+        _, _, done, _ = env.step(rng.integers(0, 3, args.envs))
+        steps += args.envs; episodes += int(done.sum())
+    el = time.perf_counter() - t0
+    env.close()
+    print(f"{steps} env-steps ({steps * args.repeat} sim ticks), {episodes} episodes in {el:.2f}s: "
+          f"{steps/el:.0f} env-steps/s on {args.workers} worker(s)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+import argparse
+import json
+import os
+import queue
+import struct
+import sys
+import threading
+import time
+from pathlib import Path
+
+from sim import DIFF_PROFILES, SHOP_ITEMS, PowerUp
+
+# Append-only history of every run, kept apart from save.json. Runs go into numbered
+# segment files of length-prefixed binary records; a segment is closed after
+# SEGMENT_RUNS of them. stats.json holds aggregates folded in one run at a time, so
+# reading them never scans the log. If stats.json is behind the log (a crash between
+# the two writes) or missing, opening the ledger folds in only the records it lacks.
+# append() folds a run in memory right away; the file writes happen on a daemon thread.
+SEGMENT_RUNS = 50_000
+HIST_BIN_S = 10          # run-length histogram: HIST_BINS bins of this many seconds,
+HIST_BINS = 30           # the last one open-ended
+DIFFICULTIES = tuple(DIFF_PROFILES)
+CAUSES = ("bomb", "quit")
+SAVED = ("shield", "second")
+
+# unix time, seed, difficulty, cause, seconds alive, coins, pickups per PowerUp.TYPES,
+# upgrade levels per SHOP_ITEMS, bombs absorbed per SAVED. Fields only ever get added
+# at the end: the length prefix lets a reader skip what it doesn't know, and a field
+# missing from an older, shorter record reads as 0
+RECORD = struct.Struct("<IIBBfH4B4B2B")
+
+def _u8(n): return min(int(n), 255)
+
+def _difficulty(name):
+    # a name DIFF_PROFILES doesn't know plays as Normal (Sim.apply_diff_profile); record it so
+    return name if name in DIFF_PROFILES else "Normal"
+
+def run_record(sim, cause="bomb"):
+    # the ledger's view of a finished (or abandoned) Sim run
+    return {"time": int(time.time()), "seed": sim.seed or 0, "difficulty": _difficulty(sim.difficulty), "cause": cause,
+            "seconds": sim.time_alive, "coins": sim.coins_collected,
+            "pickups": {k: sim.pickups.get(k, 0) for k in PowerUp.TYPES},
+            "upgrades": {key: sim.upgrades.get(key, 0) for key, *_ in SHOP_ITEMS},
+            "saved": {k: sim.saved.get(k, 0) for k in SAVED}}
+
+def pack(run):
+    body = RECORD.pack(run["time"], run["seed"], DIFFICULTIES.index(_difficulty(run["difficulty"])), CAUSES.index(run["cause"]),
+                       run["seconds"], min(run["coins"], 65535),
+                       *(_u8(run["pickups"].get(k, 0)) for k in PowerUp.TYPES),
+                       *(_u8(run["upgrades"].get(key, 0)) for key, *_ in SHOP_ITEMS),
+                       *(_u8(run["saved"].get(k, 0)) for k in SAVED))
+    return bytes((len(body),)) + body
+
+def unpack(body):
+    f = RECORD.unpack_from(bytes(body).ljust(RECORD.size, b"\0"))
+    np_, nu = len(PowerUp.TYPES), len(SHOP_ITEMS)
+    return {"time": f[0], "seed": f[1], "difficulty": DIFFICULTIES[f[2]], "cause": CAUSES[f[3]],
+            "seconds": f[4], "coins": f[5],
+            "pickups": dict(zip(PowerUp.TYPES, f[6:6+np_])),
+            "upgrades": dict(zip((key for key, *_ in SHOP_ITEMS), f[6+np_:6+np_+nu])),
+            "saved": dict(zip(SAVED, f[6+np_+nu:]))}
+
+def read_segment(path, offset=0):
+    # (run, end offset) for each whole record from `offset`; a torn last record is left out.
+    # Records of any length are whole: a shorter one was written before fields were added
+    data = Path(path).read_bytes()
+    i = offset
+    while i < len(data):
+        n = data[i]
+        if n == 0 or i + 1 + n > len(data): break   # 0: zero-filled tail, never written by pack()
+        yield unpack(data[i+1:i+1+n]), i + 1 + n
+        i += 1 + n
+
+def _empty():
+    return {"runs": 0, "deaths": 0, "best": 0.0, "seconds": 0.0, "coins": 0,
+            "pickups": {k: 0 for k in PowerUp.TYPES}, "saved": {k: 0 for k in SAVED},
+            "hist": [0] * HIST_BINS}
+
+class RunLedger:
+    def __init__(self, root):
+        self.root = Path(root)
+        self.stats_path = self.root / "stats.json"
+        self.file = None; self.file_segment = None   # the writer thread's
+        self.jobs = queue.Queue()
+        self.thread = None       # started by the first append()
+        self.stats = self._load()
+        self._catch_up()
+
+    def _load(self):
+        try:
+            st = json.loads(self.stats_path.read_text())
+            if st.get("record_size") == RECORD.size: return st
+        except (OSError, ValueError):
+            pass
+        # no usable aggregates: fold the whole log again
+        return {"record_size": RECORD.size, "runs": 0, "segment": 1, "offset": 0, "segment_runs": 0,
+                "by_difficulty": {}}
+
+    def segment_path(self, k): return self.root / f"runs-{k:06d}.bdl"
+
+    def _catch_up(self):
+        st = self.stats; behind = False
+        while True:
+            path = self.segment_path(st["segment"])
+            if path.exists() and path.stat().st_size != st["offset"]:
+                for run, end in read_segment(path, st["offset"]):
+                    self._fold(run); st["offset"] = end; st["segment_runs"] += 1; behind = True
+                if path.stat().st_size > st["offset"]:
+                    # torn write from a crash: cut it off so the next record starts clean
+                    with open(path, "r+b") as f: f.truncate(st["offset"])
+            if not self.segment_path(st["segment"] + 1).exists(): break
+            st["segment"] += 1; st["offset"] = 0; st["segment_runs"] = 0
+        if behind: self._write_stats()
+
+    def _fold(self, run):
+        st = self.stats
+        d = st["by_difficulty"].setdefault(run["difficulty"], _empty())
+        st["runs"] += 1
+        d["runs"] += 1; d["deaths"] += run["cause"] == "bomb"
+        d["best"] = max(d["best"], run["seconds"])
+        d["seconds"] += run["seconds"]; d["coins"] += run["coins"]
+        for k, v in run["pickups"].items(): d["pickups"][k] = d["pickups"].get(k, 0) + v
+        for k, v in run["saved"].items(): d["saved"][k] = d["saved"].get(k, 0) + v
+        d["hist"][min(int(run["seconds"] // HIST_BIN_S), HIST_BINS - 1)] += 1
+
+    def append(self, run):
+        # the aggregates change now; the record and stats.json reach the disk shortly after
+        st = self.stats
+        if st["segment_runs"] >= SEGMENT_RUNS:
+            st["segment"] += 1; st["offset"] = 0; st["segment_runs"] = 0
+        rec = pack(run)
+        st["offset"] += len(rec); st["segment_runs"] += 1
+        self._fold(unpack(rec[1:]))   # as stored, so a rebuild from the log gives the same numbers
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, name="run-ledger", daemon=True)
+            self.thread.start()
+        self.jobs.put((st["segment"], rec, json.dumps(st)))
+
+    def _run(self):
+        while True:
+            segment, rec, stats = self.jobs.get()
+            try:
+                if segment != self.file_segment:
+                    if self.file is not None: self.file.close()
+                    self.root.mkdir(parents=True, exist_ok=True)
+                    self.file = open(self.segment_path(segment), "ab"); self.file_segment = segment
+                self.file.write(rec); self.file.flush(); os.fsync(self.file.fileno())
+                self._write_stats(stats)   # only once its record is down
+            except OSError as e:
+                print(f"ledger: run not recorded: {e}", file=sys.stderr)
+            finally:
+                self.jobs.task_done()
+
+    def _write_stats(self, text=None):
+        # a few KB whatever the number of runs; no fsync, it can always be rebuilt from the log
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp = self.stats_path.with_name(self.stats_path.name + ".tmp")
+        tmp.write_text(json.dumps(self.stats) if text is None else text)
+        os.replace(tmp, self.stats_path)
+
+    def summary(self, difficulty):
+        # (runs, average seconds, best seconds) for the menu
+        d = self.stats["by_difficulty"].get(difficulty)
+        if not d or not d["runs"]: return 0, 0.0, 0.0
+        return d["runs"], d["seconds"] / d["runs"], d["best"]
+
+    def runs(self):
+        # every recorded run, oldest first (a full scan: for analysis, not the game)
+        k = 1
+        while self.segment_path(k).exists():
+            for run, _ in read_segment(self.segment_path(k)): yield run
+            k += 1
+
+    def close(self):
+        # waits for the runs already appended to be written
+        self.jobs.join()
+        if self.file is not None: self.file.close(); self.file = None; self.file_segment = None
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Show the BombDash run ledger")
+    ap.add_argument("root", nargs="?", default="runs")
+    ap.add_argument("--rebuild", action="store_true", help="recompute stats.json from the log")
+    args = ap.parse_args(argv)
+    if args.rebuild: Path(args.root, "stats.json").unlink(missing_ok=True)
+    led = RunLedger(args.root)
+    print(f"{led.stats['runs']} runs in {led.stats['segment']} segment(s)")
+    for diff, d in sorted(led.stats["by_difficulty"].items()):
+        n = d["runs"]
+        picks = " ".join(f"{k}={v/n:.2f}" for k, v in d["pickups"].items())
+        print(f"{diff:7s} {n:7d} runs  best {d['best']:7.1f}s  avg {d['seconds']/n:6.1f}s  "
+              f"coins/run {d['coins']/n:5.2f}  deaths {d['deaths']}  pickups/run {picks}")
+        top = max(d["hist"])
+        for i, c in enumerate(d["hist"]):
+            if c: print(f"   {i*HIST_BIN_S:4d}s{'+' if i == HIST_BINS-1 else ' '} {'#' * max(1, round(40 * c / top))} {c}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,593 @@
+import argparse
+import heapq
+import json
+import random
+import time
+import zlib
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+import pygame
+
+BASE_WIDTH, BASE_HEIGHT = 540, 720
+SIM_HZ = 120   # fixed step rate; the front end draws at its own rate, interpolating
+SIM_DT = 1.0 / SIM_HZ
+MAX_STEP_S = 1.0 / 30   # longer step() calls are split into equal sub-steps of at most this
+
+DIFF_PROFILES = {
+    "Easy":   dict(BOMB_SPEED0=160.0, SPAWN_MS0=900, SPAWN_MIN_MS=320, STEP_V=24.0, STEP_SPAWN=60),
+    "Normal": dict(BOMB_SPEED0=185.0, SPAWN_MS0=780, SPAWN_MIN_MS=260, STEP_V=28.0, STEP_SPAWN=70),
+    "Hard":   dict(BOMB_SPEED0=210.0, SPAWN_MS0=700, SPAWN_MIN_MS=220, STEP_V=34.0, STEP_SPAWN=80),
+}
+
+PLAYER_SIZE   = 52
+PLAYER_SPEED  = 340.0
+BOMB_SIZE     = 30
+DIFF_EVERY_S  = 10
+
+POWERUP_MS    = (5600, 8200)
+SLOW_FACTOR   = 0.5
+SLOW_TIME     = 5.0
+SHIELD_TIME   = 8.0
+MAGNET_TIME   = 7.0
+
+COIN_MS       = 900
+COIN_VY       = 150.0
+COIN_MAGNET_ACCEL = 520.0
+COIN_MAX_SPEED    = 440.0
+COIN_R        = 10
+
+SHOP_ITEMS = [
+    ("shield", "Shield+", "Shield lasts +2s per level", 3, 15, 10),
+    ("magnet", "Magnet+", "Magnet lasts +2s per level", 3, 15, 10),
+    ("drops",  "Drops+",  "Power-ups drop more often",   3, 20, 12),
+    ("second", "Second Chance", "One extra life per run", 1, 40, 0),
+]
+
+def upgrade_cost(key, lvl):
+    _,_,_,max_lvl, base, step = next(x for x in SHOP_ITEMS if x[0]==key)
+    if lvl>=max_lvl: return None
+    return base + step*lvl
+
+def no_upgrades():
+    return {key: 0 for key, *_ in SHOP_ITEMS}
+
+@dataclass
+class Input:
+    left: bool = False
+    right: bool = False
+
+def add_entity(items, e):
+    e.slot = len(items); items.append(e)
+
+def remove_entity(items, e):
+    # O(1) swap-remove: the last entity takes over e's slot, so order is not preserved
+    last = items.pop()
+    if last is not e: items[e.slot] = last; last.slot = e.slot
+
+# one byte per tick: bit 0 = left, bit 1 = right
+INPUTS = [Input(bool(code & 1), bool(code & 2)) for code in range(4)]
+REPLAY_MAGIC = b"BDR3"   # 2: spawns come from the sim-time Scheduler, 3: float positions, swept hits
+
+class Replay:
+    # per-run config + per-tick inputs; playing it back on a fresh Sim reproduces the run exactly
+    def __init__(self, header, inputs=b"", result=None):
+        self.header = header
+        self.inputs = bytearray(inputs)
+        self.result = result
+
+    @classmethod
+    def begin(cls, sim):
+        return cls(dict(seed=sim.seed, size=list(sim.size), difficulty=sim.difficulty,
+                        upgrades=dict(sim.upgrades), dt=SIM_DT))
+
+    def record(self, inp):
+        self.inputs.append(inp.left | inp.right << 1)
+
+    def finish(self, sim):
+        self.result = dict(ticks=len(self.inputs), time_alive=sim.time_alive,
+                           coins=sim.coins_collected, state=sim.state)
+
+    def save(self, path):
+        meta = json.dumps(dict(self.header, result=self.result)).encode()
+        Path(path).write_bytes(REPLAY_MAGIC + len(meta).to_bytes(4, "little") + meta + zlib.compress(bytes(self.inputs), 9))
+
+    @classmethod
+    def load(cls, path):
+        raw = Path(path).read_bytes()
+        if raw[:4] != REPLAY_MAGIC:
+            old = raw[:3] == REPLAY_MAGIC[:3]
+            raise ValueError(f"{path}: " + ("replay from an older version of the game" if old else "not a replay file"))
+        n = int.from_bytes(raw[4:8], "little")
+        header = json.loads(raw[8:8+n])
+        result = header.pop("result", None)
+        return cls(header, zlib.decompress(raw[8+n:]), result)
+
+    def play(self):
+        h = self.header
+        sim = Sim(tuple(h["size"]), h["difficulty"], dict(h["upgrades"]))
+        sim.start(seed=h["seed"])
+        dt = h["dt"]
+        for code in self.inputs: sim.step(INPUTS[code], dt)
+        return sim
+
+    def verify(self):
+        sim = self.play()
+        got = dict(ticks=len(self.inputs), time_alive=sim.time_alive, coins=sim.coins_collected, state=sim.state)
+        return got == self.result, got
+
+class Player:
+    def __init__(self, size, second_chance=False):
+        w, h = size
+        self.rect = pygame.Rect(w//2 - PLAYER_SIZE//2, h-PLAYER_SIZE-16, PLAYER_SIZE, PLAYER_SIZE)
+        self.x = self.prev_x = float(self.rect.x)   # exact position; rect is its whole-pixel copy
+        self.speed = PLAYER_SPEED
+        self.has_shield = False
+        self.shield_time_left = 0.0
+        self.magnet_time_left = 0.0
+        self.second_chance_available = second_chance
+
+    def update(self, dt, inp, width):
+        self.prev_x = self.x
+        if inp.left:  self.x -= self.speed * dt
+        if inp.right: self.x += self.speed * dt
+        self.x = max(0.0, min(self.x, float(width - self.rect.width)))
+        self.rect.x = int(self.x)
+        if self.has_shield:
+            self.shield_time_left = max(0.0, self.shield_time_left - dt)
+            if self.shield_time_left == 0: self.has_shield = False
+        if self.magnet_time_left > 0:
+            self.magnet_time_left = max(0.0, self.magnet_time_left - dt)
+
+    def sweep(self):
+        # (x, y, w, h) at the start and the end of the last update
+        r = self.rect
+        return (self.prev_x, r.y, r.w, r.h), (self.x, r.y, r.w, r.h)
+
+class ColumnStore:
+    # struct-of-arrays rows packed into [0, n); one float64 column per field.
+    # Iterating or indexing yields VIEW objects, which are only valid until the next removal.
+    FIELDS = ()
+    VIEW = None
+
+    def __init__(self, cap=64):
+        self.n = 0
+        for f in self.FIELDS: setattr(self, f, np.zeros(cap))
+
+    def __len__(self): return self.n
+
+    def __iter__(self): return (self.VIEW(self, i) for i in range(self.n))
+
+    def __getitem__(self, i):
+        if not -self.n <= i < self.n: raise IndexError(i)
+        return self.VIEW(self, i % self.n)
+
+    def clear(self): self.n = 0
+
+    def add(self, **row):
+        cap = len(getattr(self, self.FIELDS[0]))
+        if self.n == cap:
+            for f in self.FIELDS: setattr(self, f, np.concatenate([getattr(self, f), np.zeros(cap)]))
+        for f in self.FIELDS: getattr(self, f)[self.n] = row[f]
+        self.n += 1
+
+    def remove(self, i):
+        # O(1) swap-remove, same contract as remove_entity
+        last = self.n = self.n - 1
+        for f in self.FIELDS:
+            a = getattr(self, f); a[i] = a[last]
+
+    def keep(self, mask):
+        # stable compaction to the rows where mask (over [0, n)) is set
+        if mask.all(): return
+        idx = mask.nonzero()[0]; k = len(idx)
+        for f in self.FIELDS:
+            a = getattr(self, f); a[:k] = a[idx]
+        self.n = k
+
+def _column(name):
+    return property(lambda v: float(getattr(v.store, name)[v.i]),
+                    lambda v, val: getattr(v.store, name).__setitem__(v.i, val))
+
+class RowView:
+    __slots__ = ("store", "i")
+    def __init__(self, store, i): self.store = store; self.i = i
+
+class Bomb(RowView):
+    __slots__ = ()
+    x = _column("x"); y = _column("y"); vy = _column("vy")
+    @property
+    def rect(self): return pygame.Rect(int(self.x), int(self.y), BOMB_SIZE, BOMB_SIZE)
+
+class Coin(RowView):
+    __slots__ = ()
+    r = COIN_R
+    x = _column("x"); y = _column("y"); vx = _column("vx"); vy = _column("vy")
+    @property
+    def rect(self): return pygame.Rect(int(self.x - self.r), int(self.y - self.r), self.r*2, self.r*2)
+
+NO_HITS = np.zeros(0, np.intp)
+
+def _swept(x0, y0, x1, y1, size, p0, p1):
+    # continuous colliderect: size x size boxes moving from (x0, y0) to (x1, y1) against the player
+    # box moving from p0 to p1 ((x, y, w, h) each) during the same step. Returns the (ascending)
+    # indices of the boxes that overlap it at any moment of the step, so nothing can pass through
+    # the player between two steps. The bounding boxes of the two sweeps are compared first, rows
+    # before columns (most of what is on screen is above or below the player); the slab test on
+    # the motion relative to the player only runs for what survives that.
+    px0, py0, pw, ph = p0; px1, py1 = p1[0], p1[1]
+    cand = ((np.minimum(y0, y1) < max(py0, py1) + ph) & (np.maximum(y0, y1) + size > min(py0, py1))).nonzero()[0]
+    if not len(cand): return cand
+    cx0, cx1 = x0[cand], x1[cand]
+    cand = cand[(np.minimum(cx0, cx1) < max(px0, px1) + pw) & (np.maximum(cx0, cx1) + size > min(px0, px1))]
+    if not len(cand): return cand
+    enter = np.zeros(len(cand)); leave = np.ones(len(cand))
+    for a0, a1, hi in ((x0[cand] - px0, x1[cand] - px1, pw), (y0[cand] - py0, y1[cand] - py1, ph)):
+        # along this axis the boxes overlap while -size < a < hi
+        d = a1 - a0
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ta, tb = (-size - a0) / d, (hi - a0) / d
+        still = d == 0
+        inside = (-size < a0) & (a0 < hi)
+        np.maximum(enter, np.where(still, np.where(inside, -np.inf, np.inf), np.minimum(ta, tb)), out=enter)
+        np.minimum(leave, np.where(still, np.where(inside, np.inf, -np.inf), np.maximum(ta, tb)), out=leave)
+    return cand[enter < leave]
+
+class BombStore(ColumnStore):
+    FIELDS = ("x", "y", "vy")
+    VIEW = Bomb
+
+    def __init__(self, cap=64):
+        super().__init__(cap)
+        self.k = 0.0   # slow * dt of the last update: a row moved vy * k during it
+
+    def spawn(self, x, vy): self.add(x=x, y=-BOMB_SIZE, vy=vy)
+
+    def update(self, dt, slow=1.0):
+        n = self.n
+        self.k = slow * dt
+        self.y[:n] += self.vy[:n] * self.k
+
+    def cull(self, h):
+        # max() first: with a handful of rows the early-out is most of the cost
+        if self.n and self.y[:self.n].max() >= h: self.keep(self.y[:self.n] < h)
+
+    def hits(self, p0, p1):
+        # bombs only fall, so none reached the player's top edge if the lowest one has not
+        n = self.n
+        if not n or self.y[:n].max() + BOMB_SIZE <= min(p0[1], p1[1]): return NO_HITS
+        x, y = self.x[:n], self.y[:n]
+        return _swept(x, y - self.vy[:n] * self.k, x, y, BOMB_SIZE, p0, p1)
+
+    def center(self, i): return int(self.x[i]) + BOMB_SIZE//2, int(self.y[i]) + BOMB_SIZE//2
+
+    def centers(self):
+        n = self.n
+        return zip((self.x[:n].astype(int) + BOMB_SIZE//2).tolist(), (self.y[:n].astype(int) + BOMB_SIZE//2).tolist())
+
+class CoinStore(ColumnStore):
+    FIELDS = ("x", "y", "vx", "vy")
+    VIEW = Coin
+
+    def __init__(self, cap=64):
+        super().__init__(cap)
+        self.dt = 0.0   # of the last update: a row moved (vx, vy) * dt during it
+
+    def spawn(self, x): self.add(x=x, y=-18.0, vx=0.0, vy=COIN_VY)
+
+    def update(self, dt, player_center=None, magnet=False):
+        n = self.n
+        self.dt = dt
+        if not n: return
+        x, y, vx, vy = self.x[:n], self.y[:n], self.vx[:n], self.vy[:n]
+        if magnet and player_center:
+            px, py = player_center
+            dx, dy = px - x, py - y
+            dist = np.maximum(1.0, np.sqrt(dx*dx + dy*dy))
+            vx += COIN_MAGNET_ACCEL * dx / dist * dt
+            vy += COIN_MAGNET_ACCEL * dy / dist * dt
+        speed = np.hypot(vx, vy)
+        fast = speed > COIN_MAX_SPEED
+        if fast.any():
+            k = COIN_MAX_SPEED / speed[fast]; vx[fast] *= k; vy[fast] *= k
+        if not magnet: np.maximum(vy, COIN_VY, out=vy)
+        x += vx*dt; y += vy*dt
+
+    def cull(self, h):
+        if self.n and self.y[:self.n].max() - COIN_R >= h: self.keep(self.y[:self.n] - COIN_R < h)
+
+    def hits(self, p0, p1):
+        # a coin moves at most COIN_MAX_SPEED, which bounds the max() early-out
+        n = self.n
+        if not n or self.y[:n].max() + COIN_R + COIN_MAX_SPEED*self.dt <= min(p0[1], p1[1]): return None
+        x, y = self.x[:n] - COIN_R, self.y[:n] - COIN_R
+        idx = _swept(x - self.vx[:n]*self.dt, y - self.vy[:n]*self.dt, x, y, 2*COIN_R, p0, p1)
+        if not len(idx): return None
+        got = np.zeros(n, bool); got[idx] = True
+        return got
+
+class PowerUp:
+    TYPES = ("shield", "slow", "clear", "magnet")
+    def __init__(self, kind, x, vy=150):
+        self.rect = pygame.Rect(0, 0, 26, 26)
+        self.reset(kind, x, vy)
+    def reset(self, kind, x, vy=150):
+        # pooled instances are re-armed in place, see Sim.spawn_powerup
+        self.kind = kind
+        self.rect.topleft = (x, -26)
+        self.y = -26.0; self.dy = 0.0   # exact top and how far it moved in the last update
+        self.vy = vy
+        return self
+    def update(self, dt):
+        self.dy = self.vy * dt
+        self.y += self.dy; self.rect.y = int(self.y)
+    def apply(self, game):
+        if self.kind == "shield":
+            game.player.has_shield = True
+            game.player.shield_time_left = SHIELD_TIME + 2*game.upgrades.get("shield",0)
+        elif self.kind == "slow":
+            game.slow_time_left = SLOW_TIME
+        elif self.kind == "clear":
+            game.pops.extend((x, y, "clear") for x, y in game.bombs.centers())
+            game.bombs.clear()
+        elif self.kind == "magnet":
+            game.player.magnet_time_left = MAGNET_TIME + 2*game.upgrades.get("magnet",0)
+
+class Scheduler:
+    # repeating deadlines in simulation seconds, kept in a min-heap. advance(dt) yields every
+    # deadline the step crossed, in order, so long steps and periods shorter than a tick
+    # still fire the exact count. Re-arming a running timer only changes the period used
+    # after its next deadline, so the phase is kept
+    def __init__(self):
+        self.now = 0.0
+        self.heap = []
+        self.periods = {}
+
+    def clear(self):
+        self.now = 0.0; self.heap.clear(); self.periods.clear()
+
+    def every(self, name, seconds):
+        if name not in self.periods: heapq.heappush(self.heap, (self.now + seconds, name))
+        self.periods[name] = seconds
+
+    def advance(self, dt):
+        self.now += dt
+        heap = self.heap
+        while heap and heap[0][0] <= self.now:
+            due, name = heapq.heappop(heap)
+            yield name    # the handler may re-arm `name` before the next deadline is pushed
+            heapq.heappush(heap, (due + self.periods[name], name))
+
+class Sim:
+    # game rules with no display or event queue; effects for the renderer are
+    # left in `pops` as (x, y, kind) for one step, on_game_over is the save hook
+    def __init__(self, size=(BASE_WIDTH, BASE_HEIGHT), difficulty="Normal", upgrades=None, best=0.0):
+        self.size = size
+        self.difficulty = difficulty
+        self.upgrades = no_upgrades() if upgrades is None else upgrades
+        self.rng = random.Random()
+        self.seed = None
+        self.replay = None
+        self.pops = []
+        self.powerups = []; self.powerup_pool = []   # picked-up / fallen power-ups are reused
+        self.pool_misses = 0                         # power-ups built because the pool was empty
+        self.timers = Scheduler()         # power-ups, coins
+        self.world_timers = Scheduler()   # bombs: runs at the slow-mo rate like the bombs do
+        self.reset_full()
+        self.best_time = best
+        self.coins_collected = 0
+
+    def reset_full(self):
+        self.apply_diff_profile()
+        self.player = Player(self.size, bool(self.upgrades.get("second",0)))
+        self.bombs = BombStore(); self.coins = CoinStore()
+        self.powerup_pool.extend(self.powerups); self.powerups.clear()
+        self.time_alive = 0.0; self.diff_timer = 0.0
+        self.state = "MENU"
+        self.slow_time_left = 0.0
+        self.coins_collected = 0
+        self.pickups = {}; self.saved = {}   # per run: power-ups taken, bombs absorbed by shield/second
+        self.clear_timers()
+
+    def apply_diff_profile(self):
+        prof = DIFF_PROFILES.get(self.difficulty, DIFF_PROFILES["Normal"])
+        self.BOMB_SPEED0 = prof["BOMB_SPEED0"]; self.SPAWN_MS0 = prof["SPAWN_MS0"]
+        self.SPAWN_MIN_MS= prof["SPAWN_MIN_MS"]; self.STEP_V   = prof["STEP_V"]; self.STEP_SPAWN = prof["STEP_SPAWN"]
+        self.bomb_speed = self.BOMB_SPEED0; self.spawn_ms = self.SPAWN_MS0
+
+    def start(self, seed=None, record=False):
+        # every run gets its own seed so it can be recorded and replayed
+        self.seed = random.randrange(2**32) if seed is None else seed
+        self.rng.seed(self.seed)
+        self.apply_diff_profile()
+        self.player = Player(self.size, bool(self.upgrades.get("second",0)))
+        self.bombs.clear(); self.coins.clear(); self.pops.clear()
+        self.powerup_pool.extend(self.powerups); self.powerups.clear()
+        self.time_alive = 0.0; self.diff_timer = 0.0
+        self.slow_time_left = 0.0; self.coins_collected = 0
+        self.pickups = {}; self.saved = {}
+        self.state = "RUNNING"
+        self.clear_timers()
+        self.set_timer("bomb", self.spawn_ms)
+        self.set_timer("powerup", self.powerup_ms())
+        self.set_timer("coin", COIN_MS)
+        self.replay = Replay.begin(self) if record else None
+
+    def set_timer(self, name, ms):
+        # calls spawn_<name> every ms of simulation time
+        (self.world_timers if name == "bomb" else self.timers).every(name, ms/1000.0)
+
+    def clear_timers(self):
+        self.timers.clear(); self.world_timers.clear()
+
+    def run_timers(self, dt, slow=1.0):
+        for name in self.world_timers.advance(dt * slow): getattr(self, "spawn_" + name)()
+        for name in self.timers.advance(dt): getattr(self, "spawn_" + name)()
+
+    def powerup_ms(self):
+        drop_bonus = self.upgrades.get("drops",0)
+        lo, hi = POWERUP_MS
+        hi = max(hi - 600*drop_bonus, lo+400)
+        return self.rng.randint(lo, hi)
+
+    def bump_difficulty(self):
+        self.bomb_speed += self.STEP_V
+        self.spawn_ms = max(self.SPAWN_MIN_MS, self.spawn_ms - self.STEP_SPAWN)
+        self.set_timer("bomb", self.spawn_ms)
+
+    def on_game_over(self):
+        pass
+
+    def lap(self, name):
+        # profiling hook between the phases of step(); the front end points it at its profiler
+        pass
+
+    def step(self, inp, dt=SIM_DT):
+        # deterministic as long as dt is fixed (recorded replays assume SIM_DT). Collisions are swept,
+        # so a long step cannot skip past a hit, but spawning and the magnet are still integrated
+        # per step: dt beyond MAX_STEP_S is split into equal sub-steps with the same input
+        self.pops.clear()
+        if self.state != "RUNNING": return
+        if self.replay is not None: self.replay.record(inp)
+        k = -int(-dt // MAX_STEP_S)
+        for _ in range(k):
+            if self.state == "RUNNING": self.tick(inp, dt / k)
+
+    def tick(self, inp, dt):
+        lap = self.lap
+        w = self.size[0]
+        slow_factor = SLOW_FACTOR if self.slow_time_left > 0 else 1.0
+        self.run_timers(dt, slow_factor); lap("update.spawn")
+        if self.slow_time_left > 0: self.slow_time_left = max(0.0, self.slow_time_left - dt)
+        self.player.update(dt, inp, w)
+        pr = self.player.rect; p0, p1 = self.player.sweep(); lap("update.player")
+        self.bombs.update(dt, slow=slow_factor); lap("update.bombs")
+        for p in self.powerups: p.update(dt)
+        lap("update.powerups")
+        self.coins.update(dt, player_center=pr.center, magnet=self.player.magnet_time_left > 0); lap("update.coins")
+        self.cull(self.powerups, self.powerup_pool); lap("update.cull")
+
+        hit = self.bombs.hits(p0, p1)
+        if len(hit):
+            i = hit[0]; cx, cy = self.bombs.center(i)
+            if self.player.has_shield:
+                self.player.has_shield = False; self.player.shield_time_left = 0.0
+                self.bombs.remove(i); self.pops.append((cx, cy, "shield"))
+                self.saved["shield"] = self.saved.get("shield", 0) + 1
+            elif self.player.second_chance_available:
+                self.player.second_chance_available = False
+                self.bombs.remove(i); self.pops.append((cx, cy, "second"))
+                self.saved["second"] = self.saved.get("second", 0) + 1
+            else:
+                self.state = "GAME_OVER"
+                self.best_time = max(self.best_time, self.time_alive)
+                self.clear_timers()
+        for p in self.hits(self.powerups, p0, p1):
+            p.apply(self); remove_entity(self.powerups, p); self.powerup_pool.append(p)
+            self.pickups[p.kind] = self.pickups.get(p.kind, 0) + 1
+            self.pops.append((p.rect.centerx, p.rect.centery, p.kind))
+        got = self.coins.hits(p0, p1)
+        if got is not None and got.any():
+            n = self.coins.n
+            self.pops.extend((x, y, "coin") for x, y in zip(self.coins.x[:n][got].astype(int).tolist(),
+                                                             self.coins.y[:n][got].astype(int).tolist()))
+            self.coins_collected += int(got.sum())
+            self.coins.keep(~got)
+        lap("update.collide")
+        # bombs and coins leave after the collisions: a fast one may have crossed the player and
+        # the bottom edge in the same step
+        h = self.size[1]
+        self.bombs.cull(h); self.coins.cull(h); lap("update.cull")
+
+        self.time_alive += dt; self.diff_timer += dt
+        if self.diff_timer >= DIFF_EVERY_S:
+            self.diff_timer = 0.0; self.bump_difficulty()
+        if self.state == "GAME_OVER":
+            if self.replay is not None: self.replay.finish(self)
+            self.on_game_over()
+
+    def cull(self, items, pool):
+        # swap-remove what fell off the bottom, back into `pool`
+        if not items: return
+        h = self.size[1]
+        for e in [e for e in items if e.rect.top >= h]: remove_entity(items, e); pool.append(e)
+
+    def hits(self, items, p0, p1):
+        # swept hits against the player, in slot order. There are only ever a few power-ups:
+        # a box test over each one's path this step, then the narrow phase on what's left
+        x, y, w, h = int(min(p0[0], p1[0])), p0[1], p0[2], p0[3]
+        right = int(max(p0[0], p1[0])) + w
+        near = [e for e in items if e.rect.x <= right and e.rect.right >= x
+                and e.y - e.dy < y + h and e.y + e.rect.h > y]
+        if not near: return near
+        ys = np.array([e.y for e in near]); dys = np.array([e.dy for e in near])
+        xs = np.array([e.rect.x for e in near], float)
+        found = [near[i] for i in _swept(xs, ys - dys, xs, ys, near[0].rect.w, p0, p1).tolist()]
+        if len(found) > 1: found.sort(key=lambda e: e.slot)
+        return found
+
+    def spawn_bomb(self):
+        w, _ = self.size
+        x = self.rng.randint(0, w - BOMB_SIZE)
+        self.bombs.spawn(x, self.bomb_speed)
+
+    def spawn_powerup(self):
+        w, _ = self.size
+        kind = self.rng.choice(PowerUp.TYPES)
+        x = self.rng.randint(24, w - 50)
+        if self.powerup_pool:
+            p = self.powerup_pool.pop().reset(kind, x)
+        else:
+            p = PowerUp(kind, x); self.pool_misses += 1
+        add_entity(self.powerups, p)
+        self.set_timer("powerup", self.powerup_ms())
+
+    def spawn_coin(self):
+        w, _ = self.size
+        x = self.rng.randint(20, w - 20)
+        self.coins.spawn(x)
+
+def dodge_policy(sim):
+    # steer away from the nearest bomb above the player; a cheap stand-in for a human
+    p = sim.player.rect
+    n = sim.bombs.n
+    threat = None
+    for x, y in zip(sim.bombs.x[:n].tolist(), sim.bombs.y[:n].tolist()):
+        cx, bottom = int(x) + BOMB_SIZE//2, int(y) + BOMB_SIZE
+        if bottom <= p.top and abs(cx - p.centerx) < PLAYER_SIZE + BOMB_SIZE:
+            if threat is None or bottom > threat[1]: threat = (cx, bottom)
+    if threat is None: return Input()
+    go_left = threat[0] > p.centerx
+    if go_left and p.left <= 0 or not go_left and p.right >= sim.size[0]: go_left = not go_left
+    return Input(left=go_left, right=not go_left)
+
+def bench(seconds):
+    sim = Sim(); ticks = runs = 0
+    t0 = time.perf_counter()
+    while time.perf_counter() - t0 < seconds:
+        sim.start(); runs += 1
+        while sim.state == "RUNNING":
+            sim.step(dodge_policy(sim)); ticks += 1
+    el = time.perf_counter() - t0
+    print(f"{runs} runs, {ticks} ticks in {el:.2f}s ({ticks/el:.0f} ticks/s)")
+
+def verify_replay(path):
+    rep = Replay.load(path)
+    t0 = time.perf_counter()
+    ok, got = rep.verify()
+    el = max(time.perf_counter() - t0, 1e-9)
+    game_s = len(rep.inputs) * rep.header["dt"]
+    print(f"{path}: {'OK' if ok else 'MISMATCH'} {got} "
+          f"({game_s:.1f}s of play in {el:.3f}s, {game_s/el:.0f}x real time)")
+    if not ok: print(f"  recorded: {rep.result}")
+    return ok
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Headless BombDash simulation")
+    ap.add_argument("replays", nargs="*", help="replay files to verify instead of benchmarking")
+    ap.add_argument("--seconds", type=float, default=3.0)
+    args = ap.parse_args()
+    if args.replays:
+        raise SystemExit(0 if all([verify_replay(p) for p in args.replays]) else 1)
+    bench(args.seconds)